@@ -0,0 +1,173 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from .viewer_state import get_viewer_state
+
+
+def use_fast_read(view):
+    """Нужно ли вьюсету отвечать на чтение быстрыми сериализаторами.
+
+    Вьюсет может задать атрибут fast_read, иначе действует настройка
+    API_FAST_READ_SERIALIZERS. Browsable API строит формы по полям DRF,
+    поэтому для него используются обычные сериализаторы.
+    """
+    request = view.request
+    if request.method not in SAFE_METHODS:
+        return False
+    renderer = getattr(request, "accepted_renderer", None)
+    if renderer is not None and renderer.format == "api":
+        return False
+    fast_read = getattr(view, "fast_read", None)
+    if fast_read is None:
+        fast_read = settings.API_FAST_READ_SERIALIZERS
+    return fast_read
+
+
+class FastSerializer:
+    """Сериализатор только для чтения без интроспекции полей DRF.
+
+    Строит тот же JSON, что и обычный сериализатор, напрямую из атрибутов
+    уже загруженных объектов. Теги и авторы, которые повторяются на
+    странице, сериализуются один раз. Интерфейс совпадает с DRF настолько,
+    насколько его использует GenericViewSet.
+    """
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.request = self.context.get("request")
+        self.viewer_state = get_viewer_state(self.request)
+        self.tags = {}
+        self.authors = {}
+
+    def item(self, instance):
+        raise NotImplementedError
+
+    def to_representation(self, instance):
+        if self.many:
+            return [self.item(obj) for obj in instance]
+        return self.item(instance)
+
+    @property
+    def data(self):
+        if self.many:
+            return ReturnList(
+                self.to_representation(self.instance), serializer=self
+            )
+        return ReturnDict(
+            self.to_representation(self.instance), serializer=self
+        )
+
+    def absolute_url(self, url):
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def file_url(self, value):
+        if not value:
+            return None
+        return self.absolute_url(value.storage.url(value.name))
+
+    def variants(self, value):
+        return {
+            size: {
+                image_format: self.absolute_url(default_storage.url(name))
+                for image_format, name in names.items()
+            }
+            for size, names in value.get("sizes", {}).items()
+        }
+
+    def in_state(self, kind, pk):
+        state = self.viewer_state
+        return state is not None and pk in getattr(state, kind)
+
+    def user(self, user):
+        return {
+            "email": user.email,
+            "id": user.pk,
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "is_subscribed": self.in_state("subscriptions", user.pk),
+        }
+
+    def tag(self, tag):
+        data = self.tags.get(tag.pk)
+        if data is None:
+            data = self.tags[tag.pk] = {
+                "id": tag.pk,
+                "name": tag.name,
+                "color": tag.color,
+                "slug": tag.slug,
+            }
+        return data
+
+    def author(self, user):
+        data = self.authors.get(user.pk)
+        if data is None:
+            data = self.authors[user.pk] = self.user(user)
+        return data
+
+    def short_recipe(self, recipe):
+        return {
+            "id": recipe.pk,
+            "name": recipe.name,
+            "image": self.file_url(recipe.image),
+            "thumbnails": self.variants(recipe.image_variants),
+            "cooking_time": int(recipe.cooking_time),
+        }
+
+
+class FastRecipeReadSerializer(FastSerializer):
+    """Аналог RecipeReadSerializer для Recipe.objects.with_related()."""
+
+    def item(self, recipe):
+        return {
+            "id": recipe.pk,
+            "tags": [self.tag(tag) for tag in recipe.tags.all()],
+            "author": self.author(recipe.author),
+            "ingredients": [
+                {
+                    "id": row.ingredient.pk,
+                    "name": row.ingredient.name,
+                    "measurement_unit": row.ingredient.measurement_unit,
+                    "amount": int(row.amount),
+                }
+                for row in recipe.recipes.all()
+            ],
+            "is_favorited": self.in_state("favorites", recipe.pk),
+            "is_in_shopping_cart": self.in_state("shopping_cart", recipe.pk),
+            "name": recipe.name,
+            "image": self.file_url(recipe.image),
+            "thumbnails": self.variants(recipe.image_variants),
+            "text": recipe.text,
+            "cooking_time": int(recipe.cooking_time),
+        }
+
+
+class FastUserReadSerializer(FastSerializer):
+    """Аналог UserReadSerializer."""
+
+    def item(self, user):
+        return self.user(user)
+
+
+class FastSubscriptionsSerializer(FastSerializer):
+    """Аналог SubscriptionsSerializer для авторов с limited_recipes."""
+
+    def item(self, user):
+        return {
+            "email": user.email,
+            "id": user.pk,
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "is_subscribed": True,
+            "recipes": [
+                self.short_recipe(recipe) for recipe in user.limited_recipes
+            ],
+            "recipes_count": int(user.recipes_count),
+        }
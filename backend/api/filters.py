@@ -1,10 +1,26 @@
-from django.db.models import BooleanField, Case, Exists, OuterRef, Value, When
+from django.conf import settings
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Recipe
+from recipes.search import search_recipes
+from recipes.tag_index import index as tag_index
+
+from .viewer_state import get_viewer_state
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+def tag_choices():
+    return tag_index.choices()
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name="tags__slug")
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices, method="filter_tags"
+    )
+    search = filters.CharFilter(method="filter_search")
+    ingredients = NumberInFilter(method="filter_ingredients")
     is_favorited = filters.BooleanFilter(method="filter_for_favorite")
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_for_shopping_cart"
@@ -17,46 +33,31 @@ class RecipeFilter(FilterSet):
             "author",
         )
 
-    def apply_annotations(self, queryset):
-        return queryset.annotate(
-            is_favorited=Case(
-                When(
-                    Exists(
-                        self.request.user.favorite_user.filter(
-                            recipe=OuterRef('pk')
-                        )
-                    ),
-                    then=Value(True),
-                ),
-                default=Value(False),
-                output_field=BooleanField(),
-            ),
-            is_in_shopping_cart=Case(
-                When(
-                    Exists(
-                        self.request.user.shopping_user.filter(
-                            recipe=OuterRef('pk')
-                        )
-                    ),
-                    then=Value(True),
-                ),
-                default=Value(False),
-                output_field=BooleanField(),
-            ),
-        )
+    def filter_tags(self, queryset, name, value):
+        ids = tag_index.recipe_ids(value, settings.TAG_FILTER_MAX_IDS)
+        if ids is None:
+            # Длинный список id в запросе медленнее подзапроса по тегам.
+            ids = Recipe.tags.through.objects.filter(
+                tag__slug__in=value
+            ).values("recipe_id")
+        return queryset.filter(pk__in=ids)
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ingredients(self, queryset, name, value):
+        return queryset.ranked_by_ingredients(value)
+
+    def filter_by_viewer_state(self, queryset, value, kind):
+        if not value:
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
+        state = get_viewer_state(self.request)
+        return queryset.filter(pk__in=getattr(state, kind))
 
     def filter_for_favorite(self, queryset, name, value):
-        user = self.request.user
-        if value:
-            return self.apply_annotations(
-                queryset.filter(favorite_recipe__user=user)
-            )
-        return self.apply_annotations(queryset)
+        return self.filter_by_viewer_state(queryset, value, "favorites")
 
     def filter_for_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        if value:
-            return self.apply_annotations(
-                queryset.filter(shopping_recipe__user=user)
-            )
-        return self.apply_annotations(queryset)
+        return self.filter_by_viewer_state(queryset, value, "shopping_cart")
@@ -0,0 +1,32 @@
+from api.snapshots import CATALOGUES, build
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит сжатые снимки полных списков тегов и ингредиентов, "
+        "которые отдаются без обращения к базе данных."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names",
+            nargs="*",
+            help=(
+                f"Какие снимки построить: {', '.join(sorted(CATALOGUES))}. "
+                "По умолчанию все."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        names = options["names"] or sorted(CATALOGUES)
+        unknown = set(names) - set(CATALOGUES)
+        if unknown:
+            raise CommandError(
+                f"Неизвестные снимки: {', '.join(sorted(unknown))}."
+            )
+        for name in names:
+            version = build(name)
+            self.stdout.write(
+                self.style.SUCCESS(f"Снимок {name} построен: {version}.")
+            )
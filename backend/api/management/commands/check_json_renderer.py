@@ -0,0 +1,87 @@
+import json
+import tempfile
+import time
+
+from api import renderers
+from api.renderers import FastJSONRenderer
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+PATHS = ("/api/recipes/?limit=100", "/api/ingredients/")
+
+
+def response_data(client, path):
+    """Данные ответа до рендеринга.
+
+    Полные списки тегов и ингредиентов отдаются готовыми байтами из
+    снимков, поэтому на время запроса снимки подменяются пустым каталогом.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        with override_settings(SNAPSHOT_ROOT=directory):
+            response = client.get(path)
+    if response.status_code != 200:
+        raise CommandError(f"{path}: {response.status_code}")
+    return response.data
+
+
+def timed(renderer, data, repeat):
+    """Лучшее время из repeat запусков."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        renderer.render(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает ответы FastJSONRenderer и стандартного JSONRenderer "
+        "побайтно и показывает, во сколько раз быстрее строится JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            default=PATHS,
+            help="Адреса API, ответы которых сравниваются.",
+        )
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stderr.write(
+                "orjson не установлен, FastJSONRenderer использует json."
+            )
+        client = APIClient()
+        slow, fast = JSONRenderer(), FastJSONRenderer()
+        mismatches = 0
+        for path in options["paths"]:
+            data = response_data(client, path)
+            expected = slow.render(data)
+            actual = fast.render(data)
+            if expected != actual:
+                if json.loads(expected) != json.loads(actual):
+                    mismatches += 1
+                    self.stderr.write(f"{path}: ответы различаются")
+                    continue
+                # Например, orjson пишет 1e16 там, где json пишет 1e+16.
+                self.stderr.write(
+                    f"{path}: ответы совпадают по содержимому, "
+                    "но отличаются записью чисел"
+                )
+            slow_time = timed(slow, data, options["repeat"])
+            fast_time = timed(fast, data, options["repeat"])
+            self.stdout.write(
+                f"{path} ({len(expected) // 1024} КБ): "
+                f"json {slow_time * 1000:.2f} мс, "
+                f"orjson {fast_time * 1000:.2f} мс, "
+                f"в {slow_time / max(fast_time, 1e-9):.1f} раза быстрее"
+            )
+        if mismatches:
+            raise CommandError(f"Несовпадающих ответов: {mismatches}.")
+        self.stdout.write(self.style.SUCCESS("Ответы совпадают."))
@@ -0,0 +1,159 @@
+import json
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+
+def api_requests(user):
+    """Запросы к API, планы которых проверяются командой."""
+    recipe = Recipe.objects.order_by("pk").first()
+    tag = Tag.objects.order_by("pk").first()
+    requests = [
+        (None, "/api/recipes/"),
+        (None, "/api/recipes/?page=2&limit=6"),
+        (None, f"/api/recipes/?author={user.pk}"),
+        (None, "/api/tags/"),
+        (None, "/api/ingredients/"),
+        (None, "/api/users/"),
+        (user, "/api/recipes/"),
+        (user, "/api/recipes/?is_favorited=1"),
+        (user, "/api/recipes/?is_in_shopping_cart=1"),
+        (user, "/api/users/subscriptions/?recipes_limit=3"),
+        (user, "/api/recipes/download_shopping_cart/"),
+    ]
+    if recipe is not None:
+        requests.append((None, f"/api/recipes/{recipe.pk}/"))
+        words = recipe.name.split()
+        if words:
+            requests.append((None, f"/api/recipes/?search={words[0]}"))
+    if tag is not None:
+        requests.append((None, f"/api/recipes/?tags={tag.slug}"))
+    ingredient = Ingredient.objects.order_by("pk").first()
+    # В SQLite LIKE без учёта регистра не использует индексы, поиск по
+    # началу названия ингредиента обслуживает индекс только в PostgreSQL.
+    if ingredient is not None and connection.vendor == "postgresql":
+        requests.append(
+            (None, f"/api/ingredients/?search={quote(ingredient.name[:3])}")
+        )
+    return requests
+
+
+def postgresql_seq_scans(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", []))
+        if node["Node Type"] == "Seq Scan":
+            yield node["Relation Name"], int(node["Plan Rows"])
+
+
+def sqlite_seq_scans(sql):
+    tables = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        details = [row[-1] for row in cursor.fetchall()]
+        for detail in details:
+            match = SQLITE_SCAN.match(detail)
+            if (
+                match is None
+                or match.group(1) not in tables
+                or " USING " in detail
+            ):
+                continue
+            table = match.group(1)
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}"
+            )
+            yield table, cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет основные запросы API, получает EXPLAIN каждого SQL-запроса "
+        "и завершается с ошибкой, если встречается последовательное "
+        "сканирование таблицы больше заданного числа строк."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-rows",
+            type=int,
+            default=settings.QUERY_PLAN_MAX_SEQ_SCAN_ROWS,
+            help="Допустимое число строк в последовательном сканировании.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Email пользователя для авторизованных запросов.",
+        )
+
+    def get_user(self, email):
+        users = User.objects.order_by("pk")
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError("Нужен хотя бы один пользователь в базе.")
+        return user
+
+    def run_request(self, user, url):
+        """Выполняет запрос к API и возвращает его SELECT-запросы."""
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.stdout.write(
+            f"{response.status_code} {url}: "
+            f"{len(context.captured_queries)} запросов"
+        )
+        return [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].lstrip().upper().startswith("SELECT")
+        ]
+
+    def handle(self, *args, **options):
+        if connection.vendor == "postgresql":
+            seq_scans = postgresql_seq_scans
+        elif connection.vendor == "sqlite":
+            seq_scans = sqlite_seq_scans
+        else:
+            raise CommandError("Поддерживаются только PostgreSQL и SQLite.")
+        user = self.get_user(options["user"])
+        problems = []
+        with override_settings(
+            RECIPE_CACHE_TIMEOUT=0, PAGINATION_COUNT_CACHE_TIMEOUT=0
+        ):
+            for client_user, url in api_requests(user):
+                for sql in self.run_request(client_user, url):
+                    problems.extend(
+                        (url, table, rows, sql)
+                        for table, rows in seq_scans(sql)
+                        if rows > options["max_rows"]
+                    )
+        for url, table, rows, sql in problems:
+            self.stderr.write(
+                f"{url}: последовательное сканирование {table} "
+                f"({rows} строк)\n    {sql}"
+            )
+        if problems:
+            raise CommandError(
+                f"Найдено последовательных сканирований: {len(problems)}."
+            )
+        self.stdout.write(self.style.SUCCESS("Планы запросов в порядке."))
@@ -0,0 +1,25 @@
+from api import response_cache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Показывает статистику кеша ответов /api/recipes/."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Сбросить закешированные списки рецептов.",
+        )
+
+    def handle(self, *args, **options):
+        stats = response_cache.stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total if total else 0
+        self.stdout.write(
+            f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+            f"доля попаданий: {ratio:.1%}."
+        )
+        if options["clear"]:
+            response_cache.bump_version(response_cache.LIST_VERSION_KEY)
+            self.stdout.write(self.style.SUCCESS("Кеш списков сброшен."))
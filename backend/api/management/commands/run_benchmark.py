@@ -0,0 +1,339 @@
+import base64
+import io
+import json
+import math
+import subprocess
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from api.management.commands.seed_benchmark import USERNAME_PREFIX
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+from users.models import Subscribe, User
+
+# name - ключ в отчёте, url и data могут содержать {ключи} контекста,
+# store - ключ контекста, куда сохранить id из ответа.
+Step = namedtuple(
+    "Step", "name auth method url data store", defaults=(None, None)
+)
+
+
+def image_data_uri():
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), (73, 182, 78)).save(buffer, "JPEG")
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f"data:image/jpeg;base64,{encoded}"
+
+
+def recipe_data(context):
+    return {
+        "ingredients": [
+            {"id": pk, "amount": 10} for pk in context["ingredient_ids"]
+        ],
+        "tags": [context["tag_id"]],
+        "image": context["image"],
+        "name": "Рецепт для замера",
+        "text": "Смешать и подать.",
+        "cooking_time": 15,
+    }
+
+
+def user_data(context):
+    username = f"{USERNAME_PREFIX}run_{uuid.uuid4().hex[:12]}"
+    return {
+        "email": f"{username}@example.com",
+        "username": username,
+        "first_name": "Бенчмарк",
+        "last_name": "Новый",
+        "password": "Benchmark-password-1",
+    }
+
+
+STEPS = (
+    Step("recipes-list", None, "get", "/api/recipes/"),
+    Step("recipes-list-page", None, "get", "/api/recipes/?page=10"),
+    Step(
+        "recipes-list-cursor",
+        None,
+        "get",
+        "/api/recipes/?pagination=cursor",
+    ),
+    Step("recipes-list-tags", None, "get", "/api/recipes/?tags={tag_slug}"),
+    Step("recipes-list-author", None, "get", "/api/recipes/?author={author}"),
+    Step("recipes-list-search", None, "get", "/api/recipes/?search={word}"),
+    Step(
+        "recipes-list-ingredients",
+        None,
+        "get",
+        "/api/recipes/?ingredients={ingredients}",
+    ),
+    Step("recipes-list-auth", "user", "get", "/api/recipes/"),
+    Step(
+        "recipes-list-favorited",
+        "user",
+        "get",
+        "/api/recipes/?is_favorited=1",
+    ),
+    Step(
+        "recipes-list-in-cart",
+        "user",
+        "get",
+        "/api/recipes/?is_in_shopping_cart=1",
+    ),
+    Step("recipes-detail", None, "get", "/api/recipes/{recipe}/"),
+    Step(
+        "recipes-create", "user", "post", "/api/recipes/", recipe_data, "new"
+    ),
+    Step(
+        "recipes-partial-update",
+        "user",
+        "patch",
+        "/api/recipes/{new}/",
+        recipe_data,
+    ),
+    Step(
+        "recipes-favorite-add", "user", "post", "/api/recipes/{new}/favorite/"
+    ),
+    Step(
+        "recipes-favorite-remove",
+        "user",
+        "delete",
+        "/api/recipes/{new}/favorite/",
+    ),
+    Step(
+        "recipes-shopping-cart-add",
+        "user",
+        "post",
+        "/api/recipes/{new}/shopping_cart/",
+    ),
+    Step(
+        "recipes-download-shopping-cart",
+        "user",
+        "get",
+        "/api/recipes/download_shopping_cart/",
+    ),
+    Step(
+        "recipes-shopping-cart-remove",
+        "user",
+        "delete",
+        "/api/recipes/{new}/shopping_cart/",
+    ),
+    Step("recipes-destroy", "user", "delete", "/api/recipes/{new}/"),
+    Step("users-list", None, "get", "/api/users/"),
+    Step("users-detail", None, "get", "/api/users/{author}/"),
+    Step("users-me", "user", "get", "/api/users/me/"),
+    Step(
+        "users-subscriptions",
+        "user",
+        "get",
+        "/api/users/subscriptions/?recipes_limit=3",
+    ),
+    Step("users-subscribe", "user", "post", "/api/users/{other}/subscribe/"),
+    Step(
+        "users-unsubscribe",
+        "user",
+        "delete",
+        "/api/users/{other}/subscribe/",
+    ),
+    Step("users-create", None, "post", "/api/users/", user_data),
+    Step("ingredients-list", None, "get", "/api/ingredients/"),
+    Step("ingredients-search", None, "get", "/api/ingredients/?name=аб"),
+    Step("ingredients-detail", None, "get", "/api/ingredients/{ingredient}/"),
+    Step("tags-list", None, "get", "/api/tags/"),
+)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет запросы ко всем эндпоинтам API через тестовый клиент и "
+        "записывает p50/p95 времени ответа и число SQL-запросов в JSON. "
+        "Данные готовит команда seed_benchmark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="benchmark.json",
+            help="Файл для результатов.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Повторов каждого шага."
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=2,
+            help="Повторов перед замером, которые не учитываются.",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Отключить кеш ответов и количества объектов.",
+        )
+        parser.add_argument(
+            "--compare",
+            help="Результаты предыдущего запуска для сравнения.",
+        )
+        parser.add_argument(
+            "--serializers",
+            choices=("drf", "fast"),
+            help=(
+                "Сериализаторы чтения: drf или быстрые из "
+                "api/fast_serializers.py. По умолчанию по настройке "
+                "API_FAST_READ_SERIALIZERS."
+            ),
+        )
+
+    def get_context(self):
+        users = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by("pk")
+        user = users.filter(recipes_count__gt=0).first()
+        recipe = Recipe.objects.order_by("-pk").first()
+        tag = Tag.objects.order_by("pk").first()
+        ingredient_ids = list(
+            Ingredient.objects.order_by("pk").values_list("pk", flat=True)[:5]
+        )
+        if user is None or recipe is None or tag is None:
+            raise CommandError("Сначала выполните seed_benchmark.")
+        other = users.exclude(pk=user.pk).first()
+        Subscribe.objects.filter(user=user, author=other).delete()
+        return {
+            "user": user,
+            "author": user.pk,
+            "other": other.pk,
+            "recipe": recipe.pk,
+            "word": recipe.name.split()[0],
+            "tag_id": tag.pk,
+            "tag_slug": tag.slug,
+            "ingredient": ingredient_ids[0],
+            "ingredient_ids": ingredient_ids,
+            "ingredients": ",".join(map(str, ingredient_ids[:3])),
+            "image": image_data_uri(),
+        }
+
+    def run_step(self, clients, step, context):
+        url = step.url.format(**context)
+        data = step.data(context) if step.data else None
+        client = clients[step.auth]
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, step.method)(url, data, format="json")
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        if step.store:
+            if response.status_code >= 300:
+                raise CommandError(
+                    f"{step.name}: {response.status_code} "
+                    f"{response.content[:500]!r}"
+                )
+            context[step.store] = response.json()["id"]
+        return response.status_code, elapsed, len(queries.captured_queries)
+
+    def run(self, context, options):
+        clients = {None: APIClient(), "user": APIClient()}
+        clients["user"].force_authenticate(context["user"])
+        samples = {step.name: [] for step in STEPS}
+        for iteration in range(options["warmup"] + options["repeat"]):
+            for step in STEPS:
+                result = self.run_step(clients, step, context)
+                if iteration >= options["warmup"]:
+                    samples[step.name].append(result)
+        results = {}
+        for step in STEPS:
+            statuses, times, queries = zip(*samples[step.name])
+            results[step.name] = {
+                "method": step.method.upper(),
+                "url": step.url,
+                "statuses": sorted(set(statuses)),
+                "p50_ms": round(percentile(times, 50) * 1000, 2),
+                "p95_ms": round(percentile(times, 95) * 1000, 2),
+                "queries": max(queries),
+            }
+        return results
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat должен быть больше нуля.")
+        overrides = {"API_QUERY_BUDGET_RAISE": False}
+        if options["no_cache"]:
+            overrides.update(
+                RECIPE_CACHE_TIMEOUT=0, PAGINATION_COUNT_CACHE_TIMEOUT=0
+            )
+        if options["serializers"]:
+            overrides["API_FAST_READ_SERIALIZERS"] = (
+                options["serializers"] == "fast"
+            )
+        context = self.get_context()
+        with override_settings(**overrides):
+            fast_read = settings.API_FAST_READ_SERIALIZERS
+            results = self.run(context, options)
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "created": datetime.now(timezone.utc).isoformat(),
+                "database": connection.vendor,
+                "recipes": Recipe.objects.count(),
+                "users": User.objects.count(),
+                "repeat": options["repeat"],
+                "cache": not options["no_cache"],
+                "task_backend": settings.TASK_BACKEND,
+                "serializers": "fast" if fast_read else "drf",
+            },
+            "results": results,
+        }
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.print_report(results, options["compare"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Результаты записаны в {options['output']}.")
+        )
+
+    def print_report(self, results, compare_path):
+        previous = {}
+        if compare_path:
+            with open(compare_path, encoding="utf-8") as file:
+                previous = json.load(file)["results"]
+        for name, result in results.items():
+            line = (
+                f"{name:34} p50 {result['p50_ms']:8.2f} мс  "
+                f"p95 {result['p95_ms']:8.2f} мс  "
+                f"SQL {result['queries']:3}"
+            )
+            old = previous.get(name)
+            if old:
+                change = (
+                    (result["p50_ms"] - old["p50_ms"]) / old["p50_ms"]
+                    if old["p50_ms"]
+                    else 0
+                )
+                line += (
+                    f"  p50 {change:+.0%}, "
+                    f"SQL {result['queries'] - old['queries']:+d}"
+                )
+            self.stdout.write(line)
@@ -0,0 +1,251 @@
+import io
+import random
+from pathlib import Path
+
+from api import response_cache
+from api.pagination import USER_COUNT_VERSION_KEY
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+from recipes import models
+from recipes.counters import recount
+from recipes.ingredient_index import index as ingredient_index
+from recipes.search import index as search_index
+from recipes.search import update_search_vector
+from recipes.tag_index import index as tag_index
+from users.models import Subscribe, User
+
+INGREDIENTS_PATH = Path(settings.DATA_DIR) / "ingredients.json"
+USERNAME_PREFIX = "bench_"
+PASSWORD = "benchmark"
+BATCH_SIZE = 2000
+TAGS = (
+    ("Завтрак", "#E26C2D", "breakfast"),
+    ("Обед", "#49B64E", "lunch"),
+    ("Ужин", "#8775D2", "dinner"),
+)
+WORDS = (
+    "быстрый домашний острый сытный лёгкий праздничный летний "
+    "запечённый тушёный жареный суп салат пирог каша рагу паста "
+    "соус десерт котлеты блины смешать нарезать обжарить запечь "
+    "подать посолить поперчить варить минут духовке сковороде"
+).split()
+
+
+def zipf_weights(count):
+    """Веса популярности: несколько частых элементов и длинный хвост."""
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def image_file():
+    buffer = io.BytesIO()
+    Image.new("RGB", (600, 400), (226, 108, 45)).save(buffer, "JPEG")
+    return ContentFile(buffer.getvalue())
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт синтетических пользователей, рецепты, избранное, корзины "
+        "и подписки для нагрузочного тестирования run_benchmark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--recipes", type=int, default=2000)
+        parser.add_argument(
+            "--favorites",
+            type=int,
+            default=20,
+            help="Среднее число рецептов в избранном у пользователя.",
+        )
+        parser.add_argument(
+            "--cart",
+            type=int,
+            default=5,
+            help="Среднее число рецептов в корзине у пользователя.",
+        )
+        parser.add_argument(
+            "--subscriptions",
+            type=int,
+            default=10,
+            help="Среднее число подписок у пользователя.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=1,
+            help="Зерно генератора: одинаковые параметры дают те же данные.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Удалить данные, созданные предыдущим запуском.",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        benchmark_users = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        )
+        if options["clear"]:
+            benchmark_users.delete()
+        elif benchmark_users.exists():
+            raise CommandError(
+                "Данные уже созданы, используйте --clear для пересоздания."
+            )
+        if models.Ingredient.objects.count() < 100:
+            call_command("load_ingredients", str(INGREDIENTS_PATH))
+        with transaction.atomic():
+            users = self.create_users(options["users"])
+            recipes = self.create_recipes(rng, users, options["recipes"])
+            self.create_relations(rng, users, recipes, options)
+            recount(
+                models.Recipe,
+                User,
+                models.Favorite,
+                models.Shopping_cart,
+                Subscribe,
+            )
+            update_search_vector(
+                models.Recipe.objects.filter(author_id__in=users)
+            )
+        self.invalidate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано пользователей: {len(users)}, рецептов: "
+                f"{len(recipes)}. Пароль пользователей: {PASSWORD}."
+            )
+        )
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f"{USERNAME_PREFIX}{number}",
+                    email=f"{USERNAME_PREFIX}{number}@example.com",
+                    first_name="Бенчмарк",
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        return list(
+            User.objects.filter(
+                username__startswith=USERNAME_PREFIX
+            ).values_list("pk", flat=True)
+        )
+
+    def create_recipes(self, rng, users, count):
+        tags = [
+            models.Tag.objects.get_or_create(
+                slug=slug, defaults={"name": name, "color": color}
+            )[0].pk
+            for name, color, slug in TAGS
+        ]
+        ingredients = list(
+            models.Ingredient.objects.values_list("pk", flat=True)
+        )
+        rng.shuffle(ingredients)
+        ingredient_weights = zipf_weights(len(ingredients))
+        storage = models.Recipe._meta.get_field("image").storage
+        # Все рецепты ссылаются на один файл.
+        image = storage.save("recipes/benchmark.jpeg", image_file())
+        authors = rng.choices(users, zipf_weights(len(users)), k=count)
+        models.Recipe.objects.bulk_create(
+            (
+                models.Recipe(
+                    author_id=author,
+                    name=words(rng, rng.randint(2, 4)).capitalize(),
+                    text=words(rng, rng.randint(20, 80)),
+                    cooking_time=rng.randint(5, 180),
+                    image=image,
+                )
+                for author in authors
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        recipes = list(
+            models.Recipe.objects.filter(author_id__in=users).values_list(
+                "pk", flat=True
+            )
+        )
+        rows = []
+        tag_rows = []
+        for recipe in recipes:
+            chosen = set(
+                rng.choices(
+                    ingredients,
+                    ingredient_weights,
+                    k=max(1, round(rng.triangular(3, 15, 7))),
+                )
+            )
+            rows.extend(
+                models.RecipeIngredient(
+                    recipe_id=recipe,
+                    ingredient_id=ingredient,
+                    amount=rng.choice((1, 2, 5, 10, 50, 100, 200, 500)),
+                )
+                for ingredient in chosen
+            )
+            tag_rows.extend(
+                models.Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+                for tag in rng.sample(tags, rng.randint(1, len(tags)))
+            )
+        models.RecipeIngredient.objects.bulk_create(
+            rows, batch_size=BATCH_SIZE
+        )
+        models.Recipe.tags.through.objects.bulk_create(
+            tag_rows, batch_size=BATCH_SIZE
+        )
+        return recipes
+
+    def create_relations(self, rng, users, recipes, options):
+        recipe_weights = zipf_weights(len(recipes))
+        author_weights = zipf_weights(len(users))
+        favorites, cart, subscriptions = [], [], []
+        for user in users:
+            for model, rows, average in (
+                (models.Favorite, favorites, options["favorites"]),
+                (models.Shopping_cart, cart, options["cart"]),
+            ):
+                chosen = rng.choices(
+                    recipes, recipe_weights, k=rng.randint(0, 2 * average)
+                )
+                rows.extend(
+                    model(user_id=user, recipe_id=recipe)
+                    for recipe in set(chosen)
+                )
+            chosen = rng.choices(
+                users,
+                author_weights,
+                k=rng.randint(0, 2 * options["subscriptions"]),
+            )
+            subscriptions.extend(
+                Subscribe(user_id=user, author_id=author)
+                for author in set(chosen)
+                if author != user
+            )
+        for model, rows in (
+            (models.Favorite, favorites),
+            (models.Shopping_cart, cart),
+            (Subscribe, subscriptions),
+        ):
+            model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+    def invalidate(self):
+        """Сигналы не срабатывают на bulk_create, сбрасываем кеши сами."""
+        for index in (ingredient_index, search_index, tag_index):
+            index.invalidate()
+        response_cache.bump_version(response_cache.LIST_VERSION_KEY)
+        response_cache.bump_version(USER_COUNT_VERSION_KEY)
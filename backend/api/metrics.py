@@ -0,0 +1,227 @@
+import logging
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser
+from rest_framework.views import APIView
+
+from . import response_cache
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "api_metrics"
+# Число зарегистрированных пар view:метод, сами пары лежат в view_key(n).
+VIEW_COUNT_KEY = f"{PREFIX}:view_count"
+# Поле счётчика -> (метрика Prometheus, тип, делитель значения).
+FIELDS = {
+    "requests": ("foodgram_http_requests_total", "counter", 1),
+    "duration_us": (
+        "foodgram_http_request_duration_seconds_sum",
+        "counter",
+        1e6,
+    ),
+    "queries": ("foodgram_db_queries_total", "counter", 1),
+    "db_us": ("foodgram_db_duration_seconds_sum", "counter", 1e6),
+    "serialize_us": (
+        "foodgram_serialize_duration_seconds_sum",
+        "counter",
+        1e6,
+    ),
+    "over_budget": ("foodgram_query_budget_exceeded_total", "counter", 1),
+}
+
+known_views = set()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Число и время SQL-запросов, время сериализации и всего запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ", ".join(
+            (
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} SQL"',
+                f"serialize;dur={self.serialize_time * 1000:.1f}",
+                f"total;dur={self.total_time * 1000:.1f}",
+            )
+        )
+
+
+def counter_key(view, method, field):
+    return f"{PREFIX}:{view}:{method}:{field}"
+
+
+def view_key(number):
+    return f"{PREFIX}:view:{number}"
+
+
+def increment(key, value=1):
+    try:
+        return cache.incr(key, value)
+    except ValueError:
+        if cache.add(key, value, None):
+            return value
+        return cache.incr(key, value)
+
+
+def register_view(view, method):
+    """Запоминает пару view:метод для /api/metrics/.
+
+    Пару регистрирует только процесс, первым выполнивший cache.add, и
+    записывает её под новым номером, поэтому параллельные процессы не
+    затирают чужие пары.
+    """
+    label = f"{view}:{method}"
+    if label in known_views:
+        return
+    if cache.add(f"{PREFIX}:label:{label}", True, None):
+        cache.set(view_key(increment(VIEW_COUNT_KEY)), label, None)
+    known_views.add(label)
+
+
+def record(view, method, metrics, over_budget):
+    register_view(view, method)
+    values = {
+        "requests": 1,
+        "duration_us": int(metrics.total_time * 1e6),
+        "queries": metrics.queries,
+        "db_us": int(metrics.db_time * 1e6),
+        "serialize_us": int(metrics.serialize_time * 1e6),
+        "over_budget": int(over_budget),
+    }
+    for field, value in values.items():
+        increment(counter_key(view, method, field), value)
+
+
+def query_budget(request):
+    view_class = getattr(request.resolver_match.func, "cls", None)
+    budget = getattr(view_class, "query_budget", None)
+    if budget is not None:
+        return budget
+    if request.method in SAFE_METHODS:
+        return settings.API_QUERY_BUDGET
+    return settings.API_WRITE_QUERY_BUDGET
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL-запросы и время обработки каждого запроса.
+
+    Результат добавляется в заголовок Server-Timing и накапливается в кеше
+    по имени view для /api/metrics/. Если запрос выполнил больше
+    API_QUERY_BUDGET SQL-запросов для чтения, API_WRITE_QUERY_BUDGET для
+    записи или query_budget вьюсета, это
+    записывается в лог, а при API_QUERY_BUDGET_RAISE поднимается
+    QueryBudgetExceeded, чтобы тесты падали на N+1.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = request.metrics = RequestMetrics()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        if request.resolver_match is None:
+            return response
+        view = request.resolver_match.view_name
+        budget = query_budget(request)
+        over_budget = bool(budget) and metrics.queries > budget
+        record(view, request.method, metrics, over_budget)
+        if settings.API_SERVER_TIMING:
+            response["Server-Timing"] = metrics.server_timing()
+        if over_budget:
+            message = (
+                f"{request.method} {request.path} ({view}): "
+                f"{metrics.queries} SQL-запросов при бюджете {budget}"
+            )
+            if settings.API_QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class MetricsViewMixin:
+    """Засекает время сериализации ответа вьюсета."""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        metrics = getattr(self.request, "metrics", None)
+        if metrics is None:
+            return serializer
+        to_representation = serializer.to_representation
+
+        @wraps(to_representation)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return to_representation(*args, **kwargs)
+            finally:
+                metrics.serialize_time += time.perf_counter() - started
+
+        serializer.to_representation = timed
+        return serializer
+
+
+def prometheus_lines():
+    count = cache.get(VIEW_COUNT_KEY, 0)
+    labels = sorted(
+        set(
+            cache.get_many([view_key(n) for n in range(1, count + 1)]).values()
+        )
+    )
+    keys = [
+        counter_key(*label.rsplit(":", 1), field)
+        for label in labels
+        for field in FIELDS
+    ]
+    values = cache.get_many(keys)
+    for field, (name, metric_type, divisor) in FIELDS.items():
+        yield f"# TYPE {name} {metric_type}"
+        for label in labels:
+            view, method = label.rsplit(":", 1)
+            value = values.get(counter_key(view, method, field), 0) / divisor
+            yield f'{name}{{view="{view}",method="{method}"}} {value:g}'
+    for field, value in response_cache.stats().items():
+        name = f"foodgram_recipe_cache_{field}_total"
+        yield f"# TYPE {name} counter"
+        yield f"{name} {value}"
+
+
+class MetricsView(APIView):
+    """Накопленные метрики API в текстовом формате Prometheus."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            "\n".join(prometheus_lines()) + "\n",
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
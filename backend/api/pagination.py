@@ -1,8 +1,199 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from functools import partial
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework import pagination
 
-class PaginationForRecipe(PageNumberPagination):
+from . import response_cache
+from .viewer_state import get_viewer_state
+
+CURSOR_MODE_PARAM = "pagination"
+USER_COUNT_VERSION_KEY = "count_cache:user_version"
+# Параметры, которые не влияют на общее количество объектов.
+NON_FILTER_PARAMS = {
+    "page",
+    "limit",
+    "offset",
+    "cursor",
+    "recipes_limit",
+    CURSOR_MODE_PARAM,
+}
+
+
+def estimate_count(queryset):
+    """Оценка количества строк по плану запроса PostgreSQL."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class CountedPaginator(Paginator):
+    def __init__(self, object_list, per_page, count_function, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_function = count_function
+
+    @cached_property
+    def count(self):
+        return self.count_function(self.object_list)
+
+
+class CachedCountMixin:
+    """Кеширует общее количество объектов для пагинации.
+
+    Количество хранится PAGINATION_COUNT_CACHE_TIMEOUT секунд под ключом из
+    пути и параметров фильтрации и сбрасывается при смене версии
+    count_version_key. Для PostgreSQL при PAGINATION_COUNT_ESTIMATE_THRESHOLD
+    больше нуля выборки, которые по оценке планировщика больше порога,
+    не считаются точно.
+    """
+
+    count_version_key = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_request = request
+        return super().paginate_queryset(queryset, request, view)
+
+    @property
+    def django_paginator_class(self):
+        return partial(CountedPaginator, count_function=self.get_count)
+
+    def get_count_key_extra(self, request):
+        return ""
+
+    def get_count_key(self, request):
+        filters = request.query_params.copy()
+        for param in NON_FILTER_PARAMS:
+            filters.pop(param, None)
+        raw = "|".join(
+            (
+                request.path,
+                response_cache.normalize_query(filters),
+                self.get_count_key_extra(request),
+            )
+        )
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        version = response_cache.get_version(self.count_version_key)
+        return f"count_cache:{version}:{digest}"
+
+    def count_queryset(self, queryset):
+        threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+        if threshold and connections[queryset.db].vendor == "postgresql":
+            estimate = estimate_count(queryset)
+            if estimate >= threshold:
+                return estimate
+        return queryset.count()
+
+    def get_count(self, queryset):
+        timeout = settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        if not timeout:
+            return self.count_queryset(queryset)
+        key = self.get_count_key(self.count_request)
+        count = cache.get(key)
+        if count is None:
+            count = self.count_queryset(queryset)
+            cache.set(key, count, timeout)
+        return count
+
+
+class CursorModeMixin:
+    """Переключает пагинатор в режим курсора по запросу клиента.
+
+    Режим включается параметром ?pagination=cursor, последующие страницы
+    запрашиваются по ссылкам next/previous с параметром cursor. Курсорная
+    пагинация не считает COUNT(*) и не использует OFFSET, поэтому не
+    замедляется при глубокой прокрутке.
+
+    Курсор строится по фиксированному порядку cursor_pagination_class.
+    Выборки, которые фильтры упорядочили иначе (по релевантности ?search=
+    или покрытию ?ingredients=), разбиваются на страницы в обычном режиме,
+    чтобы не потерять их порядок.
+    """
+
+    cursor_pagination_class = None
+
+    def use_cursor(self, request, queryset):
+        requested = (
+            request.query_params.get(CURSOR_MODE_PARAM) == "cursor"
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
+        ordering = list(queryset.query.order_by)
+        return requested and (
+            not ordering or ordering == [self.cursor_pagination_class.ordering]
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request, queryset):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class CursorPaginationForRecipe(pagination.CursorPagination):
+    page_size = 6
+    page_size_query_param = "limit"
+    ordering = "-id"
+
+
+class CursorPaginationForUser(pagination.CursorPagination):
+    page_size = 6
+    page_size_query_param = "limit"
+    ordering = "id"
+
+
+class PaginationForRecipe(CursorModeMixin, pagination.PageNumberPagination):
     """Пагинатор для вьюсета RecipeViewSet."""
 
     page_size = 6
     page_size_query_param = "limit"
+    cursor_pagination_class = CursorPaginationForRecipe
+
+
+class CachedCountPaginationForRecipe(CachedCountMixin, PaginationForRecipe):
+    """Пагинатор для RecipeViewSet с кешированием количества рецептов."""
+
+    count_version_key = response_cache.LIST_VERSION_KEY
+    viewer_state_filters = {
+        "is_favorited": "favorites",
+        "is_in_shopping_cart": "shopping_cart",
+    }
+
+    def get_count_key_extra(self, request):
+        if request.user.is_anonymous:
+            return ""
+        state = get_viewer_state(request)
+        return ",".join(
+            str(hash(getattr(state, kind)))
+            for param, kind in self.viewer_state_filters.items()
+            if param in request.query_params
+        )
+
+
+class PaginationForUser(
+    CursorModeMixin, CachedCountMixin, pagination.LimitOffsetPagination
+):
+    """Пагинатор для вьюсета UserViewSet."""
+
+    cursor_pagination_class = CursorPaginationForUser
+    count_version_key = USER_COUNT_VERSION_KEY
+
+    def get_count_key_extra(self, request):
+        return str(request.user.pk)
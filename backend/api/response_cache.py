@@ -0,0 +1,117 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+PREFIX = "recipe_cache"
+LIST_VERSION_KEY = f"{PREFIX}:list_version"
+HITS_KEY = f"{PREFIX}:hits"
+MISSES_KEY = f"{PREFIX}:misses"
+
+
+def recipe_version_key(pk):
+    return f"{PREFIX}:recipe_version:{pk}"
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, None)
+
+
+def increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def normalize_query(query_params):
+    return "&".join(
+        f"{name}={value}"
+        for name in sorted(query_params)
+        for value in sorted(query_params.getlist(name))
+        if value != ""
+    )
+
+
+def make_key(request, version_key):
+    raw = "|".join(
+        (
+            request.build_absolute_uri(request.path),
+            normalize_query(request.query_params),
+        )
+    )
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"{PREFIX}:{get_version(version_key)}:{digest}"
+
+
+def stats():
+    return {
+        "hits": cache.get(HITS_KEY, 0),
+        "misses": cache.get(MISSES_KEY, 0),
+    }
+
+
+def invalidate_recipes(recipe_ids):
+    """Сбрасывает кеш списков и карточек перечисленных рецептов."""
+    recipe_ids = list(recipe_ids)
+
+    def invalidate():
+        bump_version(LIST_VERSION_KEY)
+        for pk in recipe_ids:
+            bump_version(recipe_version_key(pk))
+
+    transaction.on_commit(invalidate)
+
+
+class AnonymousResponseCacheMixin:
+    """Кеширует list и retrieve для анонимных пользователей.
+
+    Ответ анонимному пользователю зависит только от параметров запроса,
+    поэтому он хранится в кеше Django до изменения рецептов, которые в нём
+    участвуют. Время жизни задаётся настройкой RECIPE_CACHE_TIMEOUT.
+    """
+
+    def cached_response(self, request, version_key, handler, *args, **kwargs):
+        timeout = settings.RECIPE_CACHE_TIMEOUT
+        if not timeout or not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        key = make_key(request, version_key)
+        data = cache.get(key)
+        if data is not None:
+            increment(HITS_KEY)
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        increment(MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, LIST_VERSION_KEY, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            recipe_version_key(kwargs[self.lookup_field]),
+            super().retrieve,
+            *args,
+            **kwargs,
+        )
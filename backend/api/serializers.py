@@ -1,15 +1,85 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_base64.fields import Base64ImageField
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.storage import content_name
 from rest_framework import serializers
 
+from .response_cache import invalidate_recipes
+from .viewer_state import get_viewer_state
+
 User = get_user_model()
 
 
+def is_same_file(stored, uploaded):
+    """Проверяет, совпадает ли загруженный файл с уже сохранённым.
+
+    Имя файла в хранилище - хеш содержимого, поэтому достаточно сравнить
+    его с именем, которое получила бы загрузка.
+    """
+    if not stored:
+        return False
+    extension = os.path.splitext(uploaded.name)[1]
+    return os.path.basename(stored.name) == content_name(uploaded, extension)
+
+
+class RecipeImageField(Base64ImageField):
+    """Изображение рецепта с ограничениями на размер."""
+
+    default_error_messages = {
+        "too_large": "Размер изображения больше {max_bytes} байт.",
+        "too_big": (
+            "Изображение больше {max_dimension}x{max_dimension} пикселей."
+        ),
+    }
+
+    def fail_too_large(self):
+        self.fail("too_large", max_bytes=settings.IMAGE_MAX_BYTES)
+
+    def _decode(self, data):
+        if isinstance(data, str) and data.startswith("data:"):
+            encoded = data.partition(";base64,")[2]
+            if len(encoded) * 3 // 4 > settings.IMAGE_MAX_BYTES:
+                self.fail_too_large()
+        return super()._decode(data)
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        if file.size > settings.IMAGE_MAX_BYTES:
+            self.fail_too_large()
+        if max(file.image.size) > settings.IMAGE_MAX_DIMENSION:
+            self.fail("too_big", max_dimension=settings.IMAGE_MAX_DIMENSION)
+        return file
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии: {размер: {формат: url}}.
+
+    Пока копии не готовы, возвращается пустой словарь.
+    """
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        result = {}
+        for size, names in value.get("sizes", {}).items():
+            result[size] = {}
+            for image_format, name in names.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                result[size][image_format] = url
+        return result
+
+
 class UserReadSerializer(UserSerializer):
-    is_subscribed = serializers.BooleanField(read_only=True, default=False)
+    is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -22,6 +92,10 @@ class UserReadSerializer(UserSerializer):
             "is_subscribed",
         )
 
+    def get_is_subscribed(self, obj):
+        state = get_viewer_state(self.context.get("request"))
+        return state is not None and obj.pk in state.subscriptions
+
 
 class UserCreateSerializer(UserCreateSerializer):
     class Meta:
@@ -87,12 +161,13 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class RecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField(read_only=True)
+    thumbnails = ImageVariantsField(source="image_variants")
     name = serializers.ReadOnlyField()
     cooking_time = serializers.ReadOnlyField()
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "thumbnails", "cooking_time")
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
@@ -115,9 +190,10 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
         many=True, read_only=True, source="recipes"
     )
-    is_favorited = serializers.BooleanField(read_only=True)
-    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    thumbnails = ImageVariantsField(source="image_variants")
 
     class Meta:
         model = Recipe
@@ -130,10 +206,19 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "thumbnails",
             "text",
             "cooking_time",
         )
 
+    def get_is_favorited(self, obj):
+        state = get_viewer_state(self.context.get("request"))
+        return state is not None and obj.pk in state.favorites
+
+    def get_is_in_shopping_cart(self, obj):
+        state = get_viewer_state(self.context.get("request"))
+        return state is not None and obj.pk in state.shopping_cart
+
 
 class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
     """Используется как вложенный сериализатор для RecipeCreateSerializer."""
@@ -152,7 +237,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     author = UserReadSerializer(read_only=True)
     id = serializers.ReadOnlyField()
     ingredients = RecipeIngredientCreateSerializer(many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -183,19 +268,38 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 )
         return obj
 
+    def validate_ingredients(self, value):
+        amounts = {}
+        for ingredient in value:
+            amounts[ingredient["id"]] = (
+                amounts.get(ingredient["id"], 0) + ingredient["amount"]
+            )
+        existing = set(
+            Ingredient.objects.filter(pk__in=amounts).values_list(
+                "pk", flat=True
+            )
+        )
+        missing = sorted(set(amounts) - existing)
+        if missing:
+            raise serializers.ValidationError(
+                f"Ингредиенты не найдены: {', '.join(map(str, missing))}."
+            )
+        return [{"id": pk, "amount": amount} for pk, amount in amounts.items()]
+
     def tags_and_ingredients_to_through_table(self, recipe, tags, ingredients):
         recipe.tags.set(tags)
         RecipeIngredient.objects.bulk_create(
             [
                 RecipeIngredient(
                     recipe=recipe,
-                    ingredient=Ingredient.objects.get(pk=ingredient["id"]),
+                    ingredient_id=ingredient["id"],
                     amount=ingredient["amount"],
                 )
                 for ingredient in ingredients
             ]
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
@@ -205,29 +309,78 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         self.tags_and_ingredients_to_through_table(recipe, tags, ingredients)
         return recipe
 
-    def update(self, instance, validated_data):
-        instance.image = validated_data.get("image", instance.image)
-        instance.name = validated_data.get("name", instance.name)
-        instance.text = validated_data.get("text", instance.text)
-        instance.cooking_time = validated_data.get(
-            "cooking_time", instance.cooking_time
-        )
-        tags = validated_data.pop("tags")
-        ingredients = validated_data.pop("ingredients")
+    def update_ingredients(self, recipe, ingredients):
+        current = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        amounts = {
+            ingredient["id"]: ingredient["amount"]
+            for ingredient in ingredients
+        }
         RecipeIngredient.objects.filter(
-            recipe=instance, ingredient__in=instance.ingredients.all()
+            pk__in=[
+                row.pk
+                for ingredient_id, row in current.items()
+                if ingredient_id not in amounts
+            ]
         ).delete()
-        self.tags_and_ingredients_to_through_table(instance, tags, ingredients)
-        instance.save()
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            row = current.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        RecipeIngredient.objects.bulk_update(changed, ["amount"])
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                )
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id not in current
+            ]
+        )
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        tags = validated_data.pop("tags", None)
+        ingredients = validated_data.pop("ingredients", None)
+        image = validated_data.pop("image", None)
+        update_fields = []
+        for field, value in validated_data.items():
+            if getattr(instance, field) != value:
+                setattr(instance, field, value)
+                update_fields.append(field)
+        if image is not None and not is_same_file(instance.image, image):
+            instance.image = image
+            update_fields.append("image")
+        if update_fields:
+            instance.save(update_fields=update_fields)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+        invalidate_recipes([instance.pk])
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            "tags",
+            Prefetch(
+                "recipes",
+                queryset=RecipeIngredient.objects.select_related("ingredient"),
+            ),
+        )
         return RecipeReadSerializer(instance, context=self.context).data
 
 
 class SubscriptionsSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.BooleanField(read_only=True)
-    recipes = RecipeSerializer(many=True, read_only=True)
+    recipes = RecipeSerializer(
+        many=True, read_only=True, source="limited_recipes"
+    )
     recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
@@ -248,7 +401,9 @@ class SubscribeAuthorSerializer(serializers.ModelSerializer):
     email = serializers.ReadOnlyField()
     username = serializers.ReadOnlyField()
     is_subscribed = serializers.BooleanField(read_only=True)
-    recipes = RecipeSerializer(many=True, read_only=True)
+    recipes = RecipeSerializer(
+        many=True, read_only=True, source="limited_recipes"
+    )
     recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
@@ -0,0 +1,208 @@
+import csv
+import hashlib
+import io
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Sum
+from recipes.models import RecipeIngredient
+
+TITLE = "Cписок покупок:"
+CHUNK_SIZE = 2000
+# Меняется вместе с таблицей единиц, чтобы сбросить ранее выданные ETag.
+UNITS_VERSION = 1
+
+# Единица измерения -> (базовая единица, множитель). Единицы, которых нет в
+# таблице, суммируются только сами с собой.
+UNITS = {
+    "г": ("г", Decimal(1)),
+    "кг": ("г", Decimal(1000)),
+    "мл": ("мл", Decimal(1)),
+    "л": ("мл", Decimal(1000)),
+    "стакан": ("мл", Decimal(250)),
+    "ст. л.": ("мл", Decimal(15)),
+    "ч. л.": ("мл", Decimal(5)),
+    "капля": ("мл", Decimal("0.05")),
+}
+# Базовая единица -> (крупная единица, множитель) для вывода итогов.
+LARGER_UNITS = {
+    "г": ("кг", Decimal(1000)),
+    "мл": ("л", Decimal(1000)),
+}
+# Единицы, количество в которых не складывается.
+UNCOUNTABLE_UNITS = {"по вкусу"}
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+
+def cart_rows(user):
+    return RecipeIngredient.objects.filter(recipe__shopping_recipe__user=user)
+
+
+def cart_etag(user, export_format):
+    """ETag по строкам корзины и названиям и единицам их ингредиентов.
+
+    Меняется при любом изменении корзины или количеств, а также при
+    переименовании ингредиента и смене его единицы измерения.
+    """
+    digest = hashlib.sha256(f"{UNITS_VERSION}:{export_format}".encode())
+    rows = (
+        cart_rows(user)
+        .order_by("pk")
+        .values_list(
+            "pk",
+            "amount",
+            "ingredient_id",
+            "ingredient__name",
+            "ingredient__measurement_unit",
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for row in rows:
+        digest.update(repr(row).encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def grouped_rows(user):
+    return (
+        cart_rows(user)
+        .values("ingredient__name", "ingredient__measurement_unit")
+        .annotate(total_amount=Sum("amount"))
+        .order_by()
+        .values_list(
+            "ingredient__name",
+            "ingredient__measurement_unit",
+            "total_amount",
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def normalize_name(name):
+    return " ".join(name.split())
+
+
+def normalize_unit(unit):
+    return " ".join(unit.split()).casefold()
+
+
+def format_amount(amount, unit):
+    larger = LARGER_UNITS.get(unit)
+    if larger is not None and amount >= larger[1]:
+        unit, amount = larger[0], amount / larger[1]
+    amount = amount.quantize(Decimal("0.01")).normalize()
+    if amount == amount.to_integral_value():
+        return int(amount), unit
+    return float(amount), unit
+
+
+def aggregate(rows):
+    """Сводит строки (название, единица, количество) к итоговому списку.
+
+    Строки одного ингредиента с совместимыми единицами складываются в
+    базовой единице из UNITS, итог выводится в более крупной единице, если
+    она есть. Названия сравниваются без учёта регистра и лишних пробелов.
+    Строки группируются в словаре за один проход, поэтому их порядок не
+    важен. Результат отсортирован по названию.
+    """
+    totals = {}
+    names = {}
+    for name, unit, amount in rows:
+        name = normalize_name(name)
+        unit = normalize_unit(unit)
+        base_unit, factor = UNITS.get(unit, (unit, Decimal(1)))
+        key = (name.casefold(), base_unit)
+        names.setdefault(key, name)
+        if base_unit in UNCOUNTABLE_UNITS:
+            totals[key] = None
+        else:
+            totals[key] = totals.get(key, 0) + amount * factor
+    result = []
+    for key in sorted(totals):
+        total = totals[key]
+        if total is None:
+            result.append((names[key], None, key[1]))
+        else:
+            result.append((names[key], *format_amount(total, key[1])))
+    return result
+
+
+def ingredients(user):
+    return aggregate(grouped_rows(user))
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def format_line(name, amount, measurement_unit):
+    if amount is not None:
+        measurement_unit = f"{amount} {measurement_unit}"
+    return f"{name} - {measurement_unit.rstrip('.')}."
+
+
+def export_txt(rows):
+    yield TITLE
+    for row in rows:
+        yield "\n" + format_line(*row)
+
+
+def export_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("name", "amount", "measurement_unit"))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export_json(rows):
+    separator = "["
+    for name, amount, measurement_unit in rows:
+        yield separator + json.dumps(
+            {
+                "name": name,
+                "amount": amount,
+                "measurement_unit": measurement_unit,
+            },
+            ensure_ascii=False,
+        )
+        separator = ","
+    yield "[]" if separator == "[" else "]"
+
+
+def export_pdf(rows):
+    pdfmetrics.registerFont(
+        TTFont("ShoppingList", settings.SHOPPING_LIST_PDF_FONT)
+    )
+    buffer = io.BytesIO()
+    document = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - 50
+    document.setFont("ShoppingList", 16)
+    document.drawString(50, y, TITLE)
+    document.setFont("ShoppingList", 12)
+    for row in rows:
+        y -= 20
+        if y < 50:
+            document.showPage()
+            document.setFont("ShoppingList", 12)
+            y = height - 50
+        document.drawString(50, y, format_line(*row))
+    document.save()
+    yield buffer.getvalue()
+
+
+FORMATS = {
+    "txt": (export_txt, "text/plain; charset=utf-8"),
+    "csv": (export_csv, "text/csv; charset=utf-8"),
+    "json": (export_json, "application/json"),
+}
+if canvas is not None:
+    FORMATS["pdf"] = (export_pdf, "application/pdf")
@@ -0,0 +1,160 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import signals
+from django.dispatch import receiver
+from recipes import models
+from recipes.ingredient_index import index as ingredient_index
+from recipes.search import SEARCH_FIELDS
+from recipes.search import index as search_index
+from recipes.tag_index import index as tag_index
+from users.models import Subscribe
+
+from . import response_cache, snapshots, viewer_state
+from .pagination import USER_COUNT_VERSION_KEY
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {"email", "username", "first_name", "last_name"}
+
+
+def invalidate_user_counts():
+    """Сбрасывает кеш количества пользователей и подписок после коммита."""
+    transaction.on_commit(
+        lambda: response_cache.bump_version(USER_COUNT_VERSION_KEY)
+    )
+
+
+@receiver((signals.post_save, models.row_deleted), sender=models.Favorite)
+def favorite_changed(sender, instance, **kwargs):
+    viewer_state.invalidate(instance.user_id, "favorites")
+
+
+@receiver((signals.post_save, models.row_deleted), sender=models.Shopping_cart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    viewer_state.invalidate(instance.user_id, "shopping_cart")
+
+
+@receiver(signals.pre_delete, sender=models.Recipe)
+def recipe_viewers_changed(sender, instance, **kwargs):
+    """Избранное и корзины удаляются вместе с рецептом без сигналов."""
+    for kind, model in (
+        ("favorites", models.Favorite),
+        ("shopping_cart", models.Shopping_cart),
+    ):
+        viewer_state.invalidate_many(
+            model.objects.filter(recipe=instance).values_list(
+                "user_id", flat=True
+            ),
+            kind,
+        )
+
+
+@receiver((signals.post_save, signals.post_delete), sender=Subscribe)
+def subscribe_changed(sender, instance, **kwargs):
+    viewer_state.invalidate(instance.user_id, "subscriptions")
+    invalidate_user_counts()
+
+
+@receiver(signals.post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        invalidate_user_counts()
+
+
+@receiver(signals.post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_user_counts()
+
+
+@receiver((signals.post_save, signals.post_delete), sender=models.Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    response_cache.invalidate_recipes([instance.pk])
+
+
+@receiver(signals.post_save, sender=models.Recipe)
+def search_index_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        search_index.invalidate()
+
+
+@receiver(signals.post_delete, sender=models.Recipe)
+def search_index_removed(sender, instance, **kwargs):
+    search_index.invalidate()
+
+
+@receiver(
+    (signals.post_save, models.row_deleted), sender=models.RecipeIngredient
+)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    response_cache.invalidate_recipes([instance.recipe_id])
+
+
+@receiver(signals.m2m_changed, sender=models.Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        response_cache.invalidate_recipes([instance.pk])
+    elif reverse and action in ("post_add", "post_remove"):
+        response_cache.invalidate_recipes(pk_set)
+    elif reverse and action == "pre_clear":
+        response_cache.invalidate_recipes(
+            instance.recipe_set.values_list("pk", flat=True)
+        )
+
+
+@receiver(signals.m2m_changed, sender=models.Recipe.tags.through)
+def tag_index_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if action == "post_clear":
+        tag_index.invalidate()
+        return
+    added = action == "post_add"
+    if reverse:
+        changes = [(instance.pk, pk, added) for pk in pk_set]
+    else:
+        changes = [(pk, instance.pk, added) for pk in pk_set]
+    tag_index.apply(changes)
+
+
+@receiver(signals.post_delete, sender=models.Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    tag_index.remove_recipe(instance.pk)
+
+
+@receiver((signals.post_save, signals.post_delete), sender=models.Tag)
+def tag_catalogue_changed(sender, instance, **kwargs):
+    tag_index.invalidate()
+    snapshots.rebuild.delay("tags")
+
+
+@receiver((signals.post_save, signals.pre_delete), sender=models.Tag)
+def tag_changed(sender, instance, **kwargs):
+    response_cache.invalidate_recipes(
+        instance.recipe_set.values_list("pk", flat=True)
+    )
+
+
+@receiver((signals.post_save, signals.post_delete), sender=models.Ingredient)
+def ingredient_catalogue_changed(sender, instance, **kwargs):
+    ingredient_index.invalidate()
+    snapshots.rebuild.delay("ingredients")
+
+
+@receiver(signals.post_save, sender=models.Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    response_cache.invalidate_recipes(
+        models.RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values_list("recipe_id", flat=True)
+    )
+
+
+@receiver(signals.post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    response_cache.invalidate_recipes(
+        instance.recipes.values_list("pk", flat=True)
+    )
@@ -0,0 +1,212 @@
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+from collections import namedtuple
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from recipes.models import Ingredient, Tag
+from tasks.queue import task
+
+from .renderers import FastJSONRenderer
+from .serializers import IngredientSerializer, TagSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Имя снимка -> модель и сериализатор полного списка.
+CATALOGUES = {
+    "tags": (Tag, TagSerializer),
+    "ingredients": (Ingredient, IngredientSerializer),
+}
+# Content-Encoding -> расширение файла. Пустая строка - без сжатия.
+EXTENSIONS = {"": ".json", "gzip": ".json.gz", "br": ".json.br"}
+# Адрес /api/<имя>/ не версионирован, поэтому ответ всегда проверяется
+# по ETag. Версионированные файлы в SNAPSHOT_URL не меняются никогда.
+CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+Snapshot = namedtuple("Snapshot", "key version bodies")
+
+loaded = {}
+
+
+def gzip_compress(raw):
+    """gzip с нулевым mtime: одинаковый снимок даёт одинаковые байты."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(
+        fileobj=buffer, mode="wb", compresslevel=9, mtime=0
+    ) as file:
+        file.write(raw)
+    return buffer.getvalue()
+
+
+def compress(raw):
+    bodies = {"": raw, "gzip": gzip_compress(raw)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(raw)
+    return bodies
+
+
+def current_path(name, encoding=""):
+    return os.path.join(settings.SNAPSHOT_ROOT, name + EXTENSIONS[encoding])
+
+
+def version_path(name, version, encoding=""):
+    return os.path.join(
+        settings.SNAPSHOT_ROOT, f"{name}.{version}{EXTENSIONS[encoding]}"
+    )
+
+
+def write(path, body):
+    """Записывает файл целиком: читатели видят старую или новую версию."""
+    descriptor, temporary = tempfile.mkstemp(dir=settings.SNAPSHOT_ROOT)
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(body)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def remove_old_versions(name, version):
+    prefix = f"{name}."
+    keep = {
+        os.path.basename(path)
+        for encoding in EXTENSIONS
+        for path in (
+            current_path(name, encoding),
+            version_path(name, version, encoding),
+        )
+    }
+    for filename in os.listdir(settings.SNAPSHOT_ROOT):
+        if filename.startswith(prefix) and filename not in keep:
+            os.unlink(os.path.join(settings.SNAPSHOT_ROOT, filename))
+
+
+def build(name):
+    """Строит снимок полного списка и возвращает его версию.
+
+    Рядом с версионированными файлами лежат копии текущей версии без хеша
+    в имени: их читает view и отдаёт nginx. Несжатый файл пишется
+    последним, по нему процессы замечают новую версию.
+    """
+    model, serializer_class = CATALOGUES[name]
+    serializer = serializer_class(model.objects.all(), many=True)
+    raw = FastJSONRenderer().render(serializer.data)
+    version = hashlib.sha256(raw).hexdigest()[:20]
+    bodies = compress(raw)
+    os.makedirs(settings.SNAPSHOT_ROOT, exist_ok=True)
+    for encoding, body in bodies.items():
+        write(version_path(name, version, encoding), body)
+    for encoding in sorted(bodies, reverse=True):
+        write(current_path(name, encoding), bodies[encoding])
+    remove_old_versions(name, version)
+    return version
+
+
+@task
+def rebuild(name):
+    build(name)
+
+
+def read(name, key):
+    with open(current_path(name), "rb") as file:
+        raw = file.read()
+    version = hashlib.sha256(raw).hexdigest()[:20]
+    bodies = {"": raw}
+    for encoding in EXTENSIONS:
+        if not encoding:
+            continue
+        try:
+            with open(version_path(name, version, encoding), "rb") as file:
+                bodies[encoding] = file.read()
+        except FileNotFoundError:
+            pass
+    return Snapshot(key, version, bodies)
+
+
+def load(name):
+    """Текущий снимок из памяти процесса, перечитывается при замене файла."""
+    try:
+        stat = os.stat(current_path(name))
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    snapshot = loaded.get(name)
+    if snapshot is None or snapshot.key != key:
+        try:
+            snapshot = loaded[name] = read(name, key)
+        except FileNotFoundError:
+            return None
+    return snapshot
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        quality = params.strip().partition("q=")[2]
+        try:
+            if quality and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+def choose_encoding(request, snapshot):
+    accepted = accepted_encodings(request)
+    for encoding in ("br", "gzip"):
+        if encoding in accepted and encoding in snapshot.bodies:
+            return encoding
+    return ""
+
+
+def snapshot_response(request, name):
+    """Ответ из снимка или None, если снимок ещё не построен."""
+    snapshot = load(name)
+    if snapshot is None:
+        return None
+    encoding = choose_encoding(request, snapshot)
+    etag = f'"{snapshot.version}{"-" + encoding if encoding else ""}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            snapshot.bodies[encoding], content_type="application/json"
+        )
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Cache-Control"] = CACHE_CONTROL
+    response["Content-Location"] = (
+        f"{settings.SNAPSHOT_URL}{name}.{snapshot.version}"
+        f"{EXTENSIONS[encoding]}"
+    )
+    return response
+
+
+class CatalogueSnapshotMixin:
+    """Отдаёт полный список без параметров из снимка snapshot_name.
+
+    Такой ответ не обращается к базе данных. Запросы с параметрами, к
+    Browsable API и до первой сборки снимка обрабатываются как обычно.
+    """
+
+    snapshot_name = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != "json":
+            return super().list(request, *args, **kwargs)
+        response = snapshot_response(request, self.snapshot_name)
+        if response is None:
+            return super().list(request, *args, **kwargs)
+        self.headers["Vary"] = "Accept, Accept-Encoding"
+        return response
@@ -0,0 +1,1005 @@
+import base64
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from unittest import skipUnless
+
+from api import metrics, response_cache, shopping_list, snapshots
+from api.pagination import USER_COUNT_VERSION_KEY
+from api.shopping_list import UNITS, aggregate
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from recipes import models as recipe_models
+from recipes.images import release_recipe_image, variant_names
+from recipes.ingredient_index import index as ingredient_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import index as search_index
+from recipes.tag_index import index as tag_index
+from rest_framework.test import APIClient
+from users.models import Subscribe, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+def image_data_uri(color=(73, 182, 78)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+    return (
+        "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    SNAPSHOT_ROOT=f"{MEDIA_ROOT}/snapshots",
+    TASK_BACKEND="immediate",
+    API_QUERY_BUDGET_RAISE=True,
+)
+class APITestCase(TestCase):
+    """Пользователи, теги и ингредиенты, общие для тестов API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="cook",
+            email="cook@example.com",
+            password="Password-1",
+            first_name="Повар",
+            last_name="Первый",
+        )
+        cls.other = User.objects.create_user(
+            username="guest",
+            email="guest@example.com",
+            password="Password-2",
+            first_name="Гость",
+            last_name="Второй",
+        )
+        cls.tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ("Завтрак", "#E26C2D", "breakfast"),
+                ("Обед", "#49B64E", "lunch"),
+            )
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {number}", measurement_unit="г")
+            for number in range(60)
+        )
+        cls.ingredients = list(Ingredient.objects.order_by("pk"))
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @classmethod
+    def create_recipe(cls, author, ingredients, name="Рецепт"):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=name,
+            text="Смешать и подать.",
+            cooking_time=10,
+            image="recipes/test.png",
+        )
+        recipe.tags.set(cls.tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in ingredients
+        )
+        return recipe
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertLess(response.status_code, 300, response.content)
+        return len(queries.captured_queries)
+
+
+class RecipeWriteQueriesTest(APITestCase):
+    """Число запросов при записи рецепта не зависит от числа ингредиентов."""
+
+    def recipe_data(self, ingredients, name):
+        return {
+            "ingredients": [
+                {"id": ingredient.pk, "amount": 10}
+                for ingredient in ingredients
+            ],
+            "tags": [tag.pk for tag in self.tags],
+            "image": image_data_uri(),
+            "name": name,
+            "text": "Смешать и подать.",
+            "cooking_time": 15,
+        }
+
+    def create(self, count):
+        data = self.recipe_data(self.ingredients[:count], f"Рецепт {count}")
+        return lambda: self.client.post("/api/recipes/", data, format="json")
+
+    def update(self, count):
+        recipe = self.create_recipe(
+            self.user, self.ingredients[:count], f"Старый {count}"
+        )
+        data = self.recipe_data(
+            self.ingredients[30:][:count], f"Новый {count}"
+        )
+        return lambda: self.client.patch(
+            f"/api/recipes/{recipe.pk}/", data, format="json"
+        )
+
+    def assert_constant_queries(self, prepare):
+        """prepare(n) готовит данные и возвращает запрос с n ингредиентами."""
+        expected = self.count_queries(prepare(1))
+        for count in (1, 5, 30):
+            request = prepare(count)
+            with self.subTest(ingredients=count):
+                with self.assertNumQueries(expected):
+                    response = request()
+                self.assertLess(response.status_code, 300, response.content)
+
+    def test_create_queries_do_not_depend_on_ingredients(self):
+        self.assert_constant_queries(self.create)
+
+    def test_update_queries_do_not_depend_on_ingredients(self):
+        self.assert_constant_queries(self.update)
+
+    def test_duplicate_ingredients_are_merged(self):
+        ingredient = self.ingredients[0]
+        data = self.recipe_data([ingredient, ingredient], "Двойной")
+        response = self.client.post("/api/recipes/", data, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            list(
+                RecipeIngredient.objects.filter(
+                    recipe_id=response.json()["id"]
+                ).values_list("ingredient_id", "amount")
+            ),
+            [(ingredient.pk, 20)],
+        )
+
+    def test_missing_ingredients_are_rejected(self):
+        data = self.recipe_data(self.ingredients[:1], "Без ингредиента")
+        data["ingredients"].append({"id": 10**6, "amount": 1})
+        response = self.client.post("/api/recipes/", data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.filter(name="Без ингредиента"))
+
+    def test_same_image_is_not_saved_again(self):
+        data = self.recipe_data(self.ingredients[:1], "С картинкой")
+        response = self.client.post("/api/recipes/", data, format="json")
+        recipe = Recipe.objects.get(pk=response.json()["id"])
+        url = f"/api/recipes/{recipe.pk}/"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, data, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(
+            [query for query in queries if "UPDATE" in query["sql"]]
+        )
+        data["image"] = image_data_uri((0, 0, 0))
+        response = self.client.patch(url, data, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        old_name = recipe.image.name
+        recipe.refresh_from_db()
+        self.assertNotEqual(recipe.image.name, old_name)
+
+
+class SubscriptionsTestCase(APITestCase):
+    """Авторы с рецептами, на которых подписан пользователь."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        authors = [
+            User.objects.create_user(
+                username=f"author{number}",
+                email=f"author{number}@example.com",
+                password="Password-3",
+            )
+            for number in range(12)
+        ]
+        for number, author in enumerate(authors):
+            Subscribe.objects.create(user=cls.user, author=author)
+            for index in range(2):
+                recipe = cls.create_recipe(
+                    author,
+                    cls.ingredients[index:][:5],
+                    f"Рецепт {number}-{index}",
+                )
+                cls.user.favorite_user.create(recipe=recipe)
+                cls.user.shopping_user.create(recipe=recipe)
+        cls.authors = authors
+
+
+class RecipeDeleteQueriesTest(APITestCase):
+    """Удаление рецепта не выполняет запросов на каждую связанную строку."""
+
+    def popular_recipe(self, fans):
+        recipe = self.create_recipe(
+            self.user, self.ingredients[:fans][:30], f"Популярный {fans}"
+        )
+        User.objects.bulk_create(
+            User(
+                username=f"fan{fans}-{number}",
+                email=f"fan{fans}-{number}@a.ru",
+            )
+            for number in range(fans)
+        )
+        users = User.objects.filter(username__startswith=f"fan{fans}-")
+        for model in (recipe_models.Favorite, recipe_models.Shopping_cart):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipe) for user in users
+            )
+        return recipe
+
+    def test_delete_queries_do_not_depend_on_related_rows(self):
+        recipe = self.popular_recipe(1)
+        expected = self.count_queries(
+            lambda: self.client.delete(f"/api/recipes/{recipe.pk}/")
+        )
+        recipe = self.popular_recipe(200)
+        with self.assertNumQueries(expected):
+            response = self.client.delete(f"/api/recipes/{recipe.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(
+            recipe_models.Favorite.objects.filter(recipe_id=recipe.pk)
+        )
+
+    def test_deleting_user_recounts_recipes(self):
+        recipe = self.create_recipe(self.other, self.ingredients[:1])
+        self.user.favorite_user.create(recipe=recipe)
+        self.user.shopping_user.create(recipe=recipe)
+        self.other.favorite_user.create(recipe=recipe)
+        self.user.delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.in_carts_count, 0)
+
+    def test_unfavorite_updates_counter(self):
+        recipe = self.create_recipe(self.other, self.ingredients[:1])
+        self.client.post(f"/api/recipes/{recipe.pk}/favorite/")
+        self.client.post(f"/api/recipes/{recipe.pk}/shopping_cart/")
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count), (1, 1)
+        )
+        self.client.delete(f"/api/recipes/{recipe.pk}/favorite/")
+        self.client.delete(f"/api/recipes/{recipe.pk}/shopping_cart/")
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count), (0, 0)
+        )
+
+
+class ListQueriesTest(SubscriptionsTestCase):
+    """Число запросов списков не зависит от размера страницы."""
+
+    def assert_constant_queries(self, client, url):
+        """url с {limit}: сравнивает страницы из 2 и 10 объектов."""
+        cache.clear()
+        expected = self.count_queries(lambda: client.get(url.format(limit=2)))
+        cache.clear()
+        with self.assertNumQueries(expected):
+            response = client.get(url.format(limit=10))
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 10)
+        return results
+
+    def test_recipe_list(self):
+        for fast_read in (True, False):
+            with self.subTest(fast_read=fast_read), override_settings(
+                API_FAST_READ_SERIALIZERS=fast_read
+            ):
+                self.assert_constant_queries(
+                    self.anonymous, "/api/recipes/?limit={limit}"
+                )
+                results = self.assert_constant_queries(
+                    self.client,
+                    "/api/recipes/?limit={limit}"
+                    "&is_favorited=1&is_in_shopping_cart=1",
+                )
+                self.assertTrue(
+                    all(
+                        recipe["is_favorited"]
+                        and recipe["is_in_shopping_cart"]
+                        for recipe in results
+                    )
+                )
+
+    def test_subscriptions(self):
+        for fast_read in (True, False):
+            with self.subTest(fast_read=fast_read), override_settings(
+                API_FAST_READ_SERIALIZERS=fast_read
+            ):
+                results = self.assert_constant_queries(
+                    self.client,
+                    "/api/users/subscriptions/?limit={limit}&recipes_limit=1",
+                )
+                self.assertTrue(
+                    all(len(author["recipes"]) == 1 for author in results)
+                )
+
+
+class AggregateTest(SimpleTestCase):
+    """Сведение строк корзины в список покупок."""
+
+    def test_units_are_converted(self):
+        rows = [
+            ("Молоко", "л", Decimal(1)),
+            ("Молоко", "мл", Decimal(500)),
+            ("Молоко", "стакан", Decimal(2)),
+            ("Молоко", "ст. л.", Decimal(2)),
+            ("Мука", "г", Decimal(300)),
+            ("Мука", "кг", Decimal(1)),
+            ("Сахар", "ч. л.", Decimal(1)),
+        ]
+        self.assertEqual(
+            list(aggregate(rows)),
+            [
+                ("Молоко", 2.03, "л"),
+                ("Мука", 1.3, "кг"),
+                ("Сахар", 5, "мл"),
+            ],
+        )
+
+    def test_incompatible_units_are_kept_apart(self):
+        rows = [
+            ("Яйцо", "шт.", Decimal(2)),
+            ("Яйцо", "г", Decimal(50)),
+            ("Яйцо", "шт.", Decimal(3)),
+        ]
+        self.assertEqual(
+            list(aggregate(rows)), [("Яйцо", 50, "г"), ("Яйцо", 5, "шт.")]
+        )
+
+    def test_to_taste_has_no_amount(self):
+        rows = [
+            ("Соль", "по вкусу", Decimal(1)),
+            ("Соль", " По  вкусу ", Decimal(3)),
+            ("Соль", "г", Decimal(5)),
+        ]
+        self.assertEqual(
+            list(aggregate(rows)),
+            [("Соль", 5, "г"), ("Соль", None, "по вкусу")],
+        )
+
+    def test_names_are_normalized(self):
+        rows = [
+            ("  Сливочное   масло ", "г", Decimal(100)),
+            ("сливочное масло", "г", Decimal(50)),
+            ("СЛИВОЧНОЕ МАСЛО", "кг", Decimal(1)),
+            ("Сметана", "г", Decimal(200)),
+        ]
+        self.assertEqual(
+            list(aggregate(rows)),
+            [("Сливочное масло", 1.15, "кг"), ("Сметана", 200, "г")],
+        )
+
+    def test_row_order_does_not_matter(self):
+        rows = [
+            ("Молоко", "мл", Decimal(500)),
+            ("Мука", "г", Decimal(300)),
+            ("молоко", "л", Decimal(1)),
+        ]
+        self.assertEqual(
+            aggregate(rows), [("Молоко", 1.5, "л"), ("Мука", 300, "г")]
+        )
+
+    def test_large_cart_is_aggregated_in_linear_time(self):
+        units = list(UNITS) + ["шт.", "по вкусу"]
+
+        def cart(size):
+            return [
+                (
+                    f"Ингредиент {number // len(units) % 2000}",
+                    units[number % len(units)],
+                    Decimal(number % 7 + 1),
+                )
+                for number in range(size)
+            ]
+
+        def best_time(rows):
+            best = None
+            for _ in range(3):
+                started = time.perf_counter()
+                aggregate(rows)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            return best
+
+        small, large = cart(20000), cart(160000)
+        # Граммы, миллилитры, штуки и «по вкусу» для каждого ингредиента.
+        self.assertEqual(len(aggregate(large)), 2000 * 4)
+        # Восьмикратный рост корзины при линейной сложности.
+        self.assertLess(best_time(large), best_time(small) * 16)
+
+
+class ShoppingListTest(APITestCase):
+    """Выгрузка списка покупок."""
+
+    def test_download(self):
+        rows = (
+            ("Молоко", "мл"),
+            ("Мука", "г"),
+            ("молоко", "л"),
+            (" Сливочное  масло", "г"),
+            ("сливочное масло ", "кг"),
+            ("Соль", "по вкусу"),
+        )
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in rows
+        ]
+        for part in (ingredients[:3], ingredients[3:]):
+            recipe = self.create_recipe(self.other, part)
+            self.user.shopping_user.create(recipe=recipe)
+        response = self.client.get(
+            "/api/recipes/download_shopping_cart/?format=txt"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            b"".join(response.streaming_content).decode(),
+            "Cписок покупок:\nМолоко - 10.01 л.\nМука - 10 г.\n"
+            "Сливочное масло - 10.01 кг.\nСоль - по вкусу.",
+        )
+
+    @skipUnless(
+        shopping_list.canvas
+        and os.path.exists(settings.SHOPPING_LIST_PDF_FONT),
+        "Нужны reportlab и шрифт DejaVu.",
+    )
+    def test_download_pdf(self):
+        recipe = self.create_recipe(self.other, self.ingredients[:3])
+        self.user.shopping_user.create(recipe=recipe)
+        response = self.client.get(
+            "/api/recipes/download_shopping_cart/?format=pdf"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(
+            b"".join(response.streaming_content).startswith(b"%PDF")
+        )
+
+
+class TagFilterTest(APITestCase):
+    """Фильтр по тегам и индекс тегов в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipes = [
+            cls.create_recipe(cls.user, cls.ingredients[:1], f"Тег {number}")
+            for number in range(3)
+        ]
+        breakfast, lunch = cls.tags
+        cls.recipes[0].tags.set([breakfast])
+        cls.recipes[1].tags.set([lunch])
+        cls.recipes[2].tags.clear()
+
+    def setUp(self):
+        super().setUp()
+        # Индекс живёт в памяти процесса и переживает откат транзакции.
+        tag_index.version = None
+
+    def ids(self, *numbers):
+        return [self.recipes[number].pk for number in numbers]
+
+    def filtered(self, query):
+        cache.clear()
+        response = self.anonymous.get(f"/api/recipes/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return sorted(recipe["id"] for recipe in response.json()["results"])
+
+    def test_filter(self):
+        for limit in (1000, 1):
+            with self.subTest(limit=limit), override_settings(
+                TAG_FILTER_MAX_IDS=limit
+            ):
+                self.assertEqual(self.filtered("tags=breakfast"), self.ids(0))
+                self.assertEqual(
+                    self.filtered("tags=breakfast&tags=lunch"), self.ids(0, 1)
+                )
+
+    def test_changes_are_applied_after_commit(self):
+        lunch = self.tags[1]
+        before = self.ids(1)
+        self.assertEqual(tag_index.recipe_ids(["lunch"]), before)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[2].tags.add(lunch)
+            self.recipes[1].delete()
+            self.assertEqual(tag_index.recipe_ids(["lunch"]), before)
+        self.assertEqual(tag_index.recipe_ids(["lunch"]), self.ids(2))
+
+    def test_unknown_tag_is_skipped(self):
+        lunch = self.tags[1]
+        self.assertEqual(tag_index.recipe_ids(["lunch"]), self.ids(1))
+        with self.captureOnCommitCallbacks(execute=True):
+            tag_index.apply(
+                [
+                    (10**6, self.recipes[2].pk, True),
+                    (lunch.pk, self.recipes[0].pk, True),
+                ]
+            )
+        self.assertEqual(tag_index.recipes["lunch"], set(self.ids(0, 1)))
+        # Неизвестный тег требует перестройки по данным базы.
+        self.assertEqual(tag_index.recipe_ids(["lunch"]), self.ids(1))
+
+
+class ReleaseImageTest(APITestCase):
+    """Удаление изображений, на которые больше не ссылаются рецепты."""
+
+    def store(self, name, age):
+        name = default_storage.save(name, ContentFile(b"image"))
+        modified = default_storage.path(name)
+        os.utime(modified, (os.path.getatime(modified), time.time() - age))
+        return name
+
+    def test_old_files_are_removed(self):
+        source = self.store("recipes/old.png", 7200)
+        variant = self.store(variant_names(source)[0], 7200)
+        release_recipe_image(source)
+        self.assertFalse(default_storage.exists(source))
+        self.assertFalse(default_storage.exists(variant))
+
+    def test_recent_and_used_files_are_kept(self):
+        recent = self.store("recipes/recent.png", 60)
+        used = self.store("recipes/used.png", 7200)
+        recipe = self.create_recipe(self.user, self.ingredients[:1])
+        Recipe.objects.filter(pk=recipe.pk).update(image=used)
+        for name in (recent, used):
+            release_recipe_image(name)
+            self.assertTrue(default_storage.exists(name))
+
+
+class MetricsTest(APITestCase):
+    """Метрики API в формате Prometheus."""
+
+    def test_views_are_registered_once(self):
+        metrics.known_views.clear()
+        self.anonymous.get("/api/recipes/")
+        self.anonymous.get("/api/tags/")
+        metrics.known_views.clear()
+        self.anonymous.get("/api/recipes/")
+        self.assertEqual(cache.get(metrics.VIEW_COUNT_KEY), 2)
+        lines = list(metrics.prometheus_lines())
+        self.assertIn(
+            'foodgram_http_requests_total{view="recipes-list",method="GET"} 2',
+            lines,
+        )
+        self.assertIn(
+            'foodgram_http_requests_total{view="tags-list",method="GET"} 1',
+            lines,
+        )
+
+
+class FastSerializersTest(SubscriptionsTestCase):
+    """Быстрые сериализаторы отвечают побайтно так же, как DRF."""
+
+    PATHS = (
+        "/api/recipes/?limit=30",
+        "/api/recipes/?limit=5&is_favorited=1",
+        "/api/recipes/{recipe}/",
+        "/api/users/?limit=30",
+        "/api/users/{author}/",
+    )
+    USER_PATHS = (
+        "/api/users/me/",
+        "/api/users/subscriptions/?limit=30",
+        "/api/users/subscriptions/?limit=30&recipes_limit=1",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        author = cls.authors[0]
+        Subscribe.objects.create(user=cls.other, author=author)
+        cls.other.favorite_user.create(recipe=author.recipes.first())
+        recipe = cls.create_recipe(cls.other, cls.ingredients[:2], "Без тегов")
+        recipe.tags.clear()
+
+    def render(self, client, path, fast_read):
+        cache.clear()
+        with override_settings(API_FAST_READ_SERIALIZERS=fast_read):
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.content
+
+    def assert_identical(self, client, paths):
+        author = self.authors[0]
+        for path in paths:
+            path = path.format(
+                recipe=author.recipes.first().pk, author=author.pk
+            )
+            with self.subTest(path=path):
+                self.assertEqual(
+                    self.render(client, path, True),
+                    self.render(client, path, False),
+                )
+
+    def test_anonymous(self):
+        self.assert_identical(self.anonymous, self.PATHS)
+
+    def test_authenticated(self):
+        other = APIClient()
+        other.force_authenticate(self.other)
+        for client in (self.client, other):
+            self.assert_identical(client, self.PATHS + self.USER_PATHS)
+
+
+class CursorPaginationTest(APITestCase):
+    """Курсорный режим пагинации списка рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipes = [
+            cls.create_recipe(
+                cls.user, cls.ingredients[:number], f"Курсор {number}"
+            )
+            for number in range(1, 8)
+        ]
+        cls.recipes[0].tags.clear()
+
+    def collect(self, url):
+        """Проходит по ссылкам next и возвращает id и число страниц."""
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(recipe["id"] for recipe in data["results"])
+            url, pages = data["next"], pages + 1
+        return ids, pages
+
+    def test_filtered_pages(self):
+        ids, pages = self.collect(
+            "/api/recipes/?pagination=cursor&limit=2&tags=lunch"
+        )
+        self.assertEqual(
+            ids, [recipe.pk for recipe in reversed(self.recipes[1:])]
+        )
+        self.assertEqual(pages, 3)
+        response = self.client.get(
+            "/api/recipes/?pagination=cursor&limit=2&tags=lunch"
+        )
+        self.assertNotIn("count", response.json())
+
+    def test_ranked_filter_keeps_its_order(self):
+        ingredient = self.ingredients[6]
+        query = f"limit=2&ingredients={ingredient.pk}"
+        offset_ids, _ = self.collect(f"/api/recipes/?{query}")
+        cursor_ids, _ = self.collect(
+            f"/api/recipes/?pagination=cursor&{query}"
+        )
+        self.assertEqual(cursor_ids, offset_ids)
+        self.assertEqual(offset_ids, [self.recipes[6].pk])
+        query = f"limit=3&ingredients={self.ingredients[0].pk}"
+        offset_ids, _ = self.collect(f"/api/recipes/?{query}")
+        cursor_ids, _ = self.collect(
+            f"/api/recipes/?pagination=cursor&{query}"
+        )
+        self.assertEqual(cursor_ids, offset_ids)
+        # Рецепт из одного ингредиента покрыт полностью и идёт первым.
+        self.assertEqual(cursor_ids[0], self.recipes[0].pk)
+        self.assertEqual(len(cursor_ids), 7)
+
+    def count_queries_run(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        counts = [
+            query for query in queries if "COUNT(" in query["sql"].upper()
+        ]
+        return response.json()["count"], len(counts)
+
+    def test_count_is_cached_until_recipes_change(self):
+        url = "/api/recipes/?limit=2&tags=lunch"
+        self.assertEqual(self.count_queries_run(url), (6, 1))
+        self.assertEqual(self.count_queries_run(f"{url}&page=2"), (6, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.get(pk=self.recipes[1].pk).delete()
+        self.assertEqual(self.count_queries_run(url), (5, 1))
+
+
+class UserCountCacheTest(APITestCase):
+    """Кеш количества пользователей и подписок для пагинации."""
+
+    def test_version_changes_after_commit(self):
+        before = response_cache.get_version(USER_COUNT_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscribe.objects.create(user=self.user, author=self.other)
+            self.assertEqual(
+                response_cache.get_version(USER_COUNT_VERSION_KEY), before
+            )
+        self.assertEqual(
+            response_cache.get_version(USER_COUNT_VERSION_KEY), before + 1
+        )
+
+    def test_subscriptions_count_is_refreshed(self):
+        url = "/api/users/subscriptions/"
+        self.assertEqual(self.client.get(url).json()["count"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/api/users/{self.other.pk}/subscribe/"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(url).json()["count"], 1)
+
+
+class IngredientSearchTest(APITestCase):
+    """Подсказки ингредиентов ?name= из индекса в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ("Хумус", "Мускатный орех", "Мука", "Соль"):
+            Ingredient.objects.create(name=name, measurement_unit="г")
+
+    def setUp(self):
+        super().setUp()
+        # Индекс живёт в памяти процесса и переживает откат транзакции.
+        ingredient_index.version = None
+
+    def names(self, query):
+        response = self.anonymous.get(f"/api/ingredients/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [ingredient["name"] for ingredient in response.json()]
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            self.names("name=МУ"), ["Мука", "Мускатный орех", "Хумус"]
+        )
+
+    @override_settings(INGREDIENT_SEARCH_LIMIT=2)
+    def test_limit(self):
+        self.assertEqual(len(self.names("name=Ингредиент")), 2)
+
+    @override_settings(INGREDIENT_SEARCH_LIMIT=2)
+    def test_empty_name_returns_full_list(self):
+        total = Ingredient.objects.count()
+        self.assertEqual(len(self.names("name=")), total)
+        self.assertEqual(len(self.names("name=%20")), total)
+
+
+class ResponseCacheTest(APITestCase):
+    """Кеш ответов анонимным пользователям и его сброс."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tagged = cls.create_recipe(
+            cls.user, cls.ingredients[:2], "С тегом"
+        )
+        cls.untagged = cls.create_recipe(
+            cls.user, cls.ingredients[:2], "Без тега"
+        )
+        cls.untagged.tags.clear()
+
+    def cache_status(self, url, client=None):
+        response = (client or self.anonymous).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.get("X-Cache")
+
+    def test_anonymous_responses_are_cached(self):
+        for url in ("/api/recipes/", f"/api/recipes/{self.tagged.pk}/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.cache_status(url), "MISS")
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.cache_status(url), "HIT")
+                self.assertIsNone(self.cache_status(url, self.client))
+        self.assertEqual(response_cache.stats(), {"hits": 2, "misses": 2})
+
+    def test_tag_change_invalidates_its_recipes(self):
+        tagged = f"/api/recipes/{self.tagged.pk}/"
+        untagged = f"/api/recipes/{self.untagged.pk}/"
+        for url in ("/api/recipes/", tagged, untagged):
+            self.cache_status(url)
+        tag = self.tags[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = "Поздний завтрак"
+            tag.save()
+        self.assertEqual(self.cache_status("/api/recipes/"), "MISS")
+        self.assertEqual(self.cache_status(tagged), "MISS")
+        self.assertEqual(self.cache_status(untagged), "HIT")
+        self.assertIn(
+            "Поздний завтрак",
+            [tag["name"] for tag in self.anonymous.get(tagged).json()["tags"]],
+        )
+
+
+class SearchTest(APITestCase):
+    """Полнотекстовый поиск ?search= по индексу в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipes = {}
+        for name, text in (
+            ("Борщ", "Сварить свеклу и капусту."),
+            ("Салат со свеклой", "Нарезать и заправить."),
+            ("Суп", "Не борщ, но тоже вкусно."),
+        ):
+            recipe = cls.create_recipe(cls.user, cls.ingredients[:1], name)
+            recipe.text = text
+            recipe.save(update_fields=["text"])
+            cls.recipes[name] = recipe
+
+    def setUp(self):
+        super().setUp()
+        # Индекс живёт в памяти процесса и переживает откат транзакции.
+        search_index.version = None
+
+    def names(self, query):
+        response = self.anonymous.get(f"/api/recipes/?search={query}")
+        self.assertEqual(response.status_code, 200)
+        return [recipe["name"] for recipe in response.json()["results"]]
+
+    def test_name_outweighs_text(self):
+        self.assertEqual(self.names("свекл"), ["Салат со свеклой", "Борщ"])
+        self.assertEqual(self.names("БОРЩ"), ["Борщ", "Суп"])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.names("борщ вкусно"), ["Суп"])
+        self.assertEqual(self.names("борщ пирог"), [])
+
+    def test_index_is_updated_after_commit(self):
+        recipe = self.recipes["Суп"]
+        self.assertEqual(self.names("суп"), ["Суп"])
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.name = "Пирог"
+            recipe.save(update_fields=["name"])
+            self.assertEqual(self.names("пирог"), [])
+        self.assertEqual(self.names("пирог"), ["Пирог"])
+
+
+class IngredientRankingTest(APITestCase):
+    """Подбор рецептов по ингредиентам ?ingredients=."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        a, b, c, d = cls.ingredients[:4]
+        cls.recipes = {
+            name: cls.create_recipe(cls.user, ingredients, name)
+            for name, ingredients in (
+                ("Оба", [a, b]),
+                ("Один", [a]),
+                ("Половина", [a, b, c, d]),
+                ("Чужой", [c]),
+                ("Один из двух", [a, c]),
+            )
+        }
+        cls.recipes["Один"].tags.clear()
+
+    def setUp(self):
+        super().setUp()
+        tag_index.version = None
+
+    def names(self, query):
+        response = self.anonymous.get(f"/api/recipes/?{query}")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        names = [recipe["name"] for recipe in data["results"]]
+        self.assertEqual(data["count"], len(names))
+        return names
+
+    def test_recipes_are_ranked_by_coverage(self):
+        a, b = self.ingredients[:2]
+        self.assertEqual(
+            self.names(f"ingredients={a.pk},{b.pk}"),
+            ["Оба", "Один", "Половина", "Один из двух"],
+        )
+
+    def test_ranking_is_combined_with_filters(self):
+        a, b = self.ingredients[:2]
+        self.assertEqual(
+            self.names(f"ingredients={a.pk},{b.pk}&tags=lunch&limit=10"),
+            ["Оба", "Половина", "Один из двух"],
+        )
+
+
+class SnapshotTest(APITestCase):
+    """Список тегов из снимка: ETag, сжатие и пересборка."""
+
+    def setUp(self):
+        super().setUp()
+        snapshots.build("tags")
+
+    def tearDown(self):
+        # Снимки не должны попасть в ответы другим тестам.
+        shutil.rmtree(f"{MEDIA_ROOT}/snapshots", ignore_errors=True)
+
+    def get(self, **headers):
+        with self.assertNumQueries(0):
+            return self.anonymous.get("/api/tags/", **headers)
+
+    def test_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        # Снимок совпадает с ответом, построенным из базы данных.
+        self.assertEqual(
+            json.loads(response.content),
+            self.anonymous.get("/api/tags/?format=json").json(),
+        )
+        etag = response["ETag"]
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        response = self.get(HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["ETag"], f'{etag[:-1]}-gzip"')
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content)),
+            json.loads(self.get().content),
+        )
+
+    def test_rebuilt_after_commit(self):
+        etag = self.get()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name="Ужин", color="#8775D2", slug="dinner")
+            self.assertEqual(
+                self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304
+            )
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn(
+            "dinner", [tag["slug"] for tag in json.loads(response.content)]
+        )
+
+
+class ImageVariantsTest(APITestCase):
+    """Уменьшенные копии изображения рецепта и ограничения на размер."""
+
+    def post(self, image):
+        data = {
+            "ingredients": [{"id": self.ingredients[0].pk, "amount": 10}],
+            "tags": [self.tags[0].pk],
+            "image": image,
+            "name": "С картинкой",
+            "text": "Смешать и подать.",
+            "cooking_time": 15,
+        }
+        return self.client.post("/api/recipes/", data, format="json")
+
+    def test_variants_are_built_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(image_data_uri())
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()["thumbnails"], {})
+        recipe = Recipe.objects.get(pk=response.json()["id"])
+        self.assertEqual(recipe.image_variants["source"], recipe.image.name)
+        for name in variant_names(recipe.image.name):
+            self.assertTrue(default_storage.exists(name), name)
+        response = self.anonymous.get(f"/api/recipes/{recipe.pk}/")
+        thumbnails = response.json()["thumbnails"]
+        self.assertEqual(set(thumbnails), {"list", "detail"})
+        self.assertTrue(thumbnails["list"]["webp"].endswith("-list.webp"))
+
+    @override_settings(IMAGE_MAX_DIMENSION=4)
+    def test_too_big_image_is_rejected(self):
+        response = self.post(image_data_uri())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.json())
+
+    @override_settings(IMAGE_MAX_BYTES=16)
+    def test_too_large_image_is_rejected(self):
+        response = self.post(image_data_uri())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.json())
+        self.assertFalse(Recipe.objects.exists())
@@ -2,6 +2,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from . import views
+from .metrics import MetricsView
 
 router = DefaultRouter()
 router.register("recipes", views.RecipeViewSet, basename="recipes")
@@ -10,6 +11,7 @@ router.register("users", views.UserViewSet, basename="users")
 router.register("ingredients", views.IngredientViewSet, basename="ingredients")
 
 urlpatterns = [
+    path("metrics/", MetricsView.as_view(), name="metrics"),
     path("", include(router.urls)),
     path("auth/", include("djoser.urls.authtoken")),
 ]
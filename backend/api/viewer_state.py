@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import cached_property
+from recipes.models import Favorite, Shopping_cart
+from users.models import Subscribe
+
+CACHE_KEY = "viewer_state:{user_id}:{kind}"
+
+
+def cache_key(user_id, kind):
+    return CACHE_KEY.format(user_id=user_id, kind=kind)
+
+
+def invalidate(user_id, kind):
+    """Сбрасывает набор после коммита, чтобы не закешировать старые данные."""
+    invalidate_many([user_id], kind)
+
+
+def invalidate_many(user_ids, kind):
+    keys = [cache_key(user_id, kind) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class ViewerState:
+    """Избранное, корзина и подписки текущего пользователя.
+
+    Наборы id загружаются один раз за запрос и накладываются на ответ при
+    сериализации, поэтому запрос за рецептами одинаков для всех
+    пользователей. При VIEWER_STATE_CACHE_TIMEOUT > 0 наборы дополнительно
+    хранятся в кеше до изменения соответствующей таблицы.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def load(self, kind, queryset, field):
+        if self.user.is_anonymous:
+            return frozenset()
+        timeout = settings.VIEWER_STATE_CACHE_TIMEOUT
+        key = cache_key(self.user.pk, kind)
+        if timeout:
+            ids = cache.get(key)
+            if ids is not None:
+                return ids
+        ids = frozenset(
+            queryset.filter(user=self.user).values_list(field, flat=True)
+        )
+        if timeout:
+            cache.set(key, ids, timeout)
+        return ids
+
+    @cached_property
+    def favorites(self):
+        return self.load("favorites", Favorite.objects, "recipe_id")
+
+    @cached_property
+    def shopping_cart(self):
+        return self.load("shopping_cart", Shopping_cart.objects, "recipe_id")
+
+    @cached_property
+    def subscriptions(self):
+        return self.load("subscriptions", Subscribe.objects, "author_id")
+
+
+def get_viewer_state(request):
+    if request is None:
+        return None
+    state = getattr(request, "_viewer_state", None)
+    if state is None:
+        state = ViewerState(request.user)
+        request._viewer_state = state
+    return state
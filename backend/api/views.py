@@ -10,72 +10,73 @@ from api.serializers import (
     UserCreateSerializer,
     UserReadSerializer,
 )
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import (
-    BooleanField,
-    Case,
-    Count,
-    Exists,
-    OuterRef,
-    Prefetch,
-    Sum,
-    Value,
-    When,
-)
-from django.http import HttpResponse
+from django.db.models import Value
+from django.http import HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from recipes.ingredient_index import index as ingredient_index
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredient,
     Shopping_cart,
     Tag,
 )
 from rest_framework import filters, mixins, permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from users.models import Subscribe
 
+from . import shopping_list
+from .fast_serializers import (
+    FastRecipeReadSerializer,
+    FastSubscriptionsSerializer,
+    FastUserReadSerializer,
+    use_fast_read,
+)
 from .filters import RecipeFilter
-from .pagination import PaginationForRecipe
+from .metrics import MetricsViewMixin
+from .negotiation import IgnoreFormatContentNegotiation
+from .pagination import CachedCountPaginationForRecipe, PaginationForUser
 from .permission import AuthorOrReadOnlyPermission
+from .response_cache import AnonymousResponseCacheMixin
+from .snapshots import CatalogueSnapshotMixin
 
 User = get_user_model()
 
 
+def attach_limited_recipes(authors, request):
+    """Добавляет авторам не больше recipes_limit последних рецептов."""
+    try:
+        limit = int(request.query_params["recipes_limit"])
+    except (KeyError, ValueError):
+        limit = None
+    if limit is not None and limit < 0:
+        limit = None
+    recipes = Recipe.objects.latest_by_author(
+        [author.pk for author in authors], limit
+    )
+    for author in authors:
+        author.limited_recipes = recipes[author.pk]
+
+
 class UserViewSet(
+    MetricsViewMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet,
 ):
-    def get_queryset(self):
-        queryset = User.objects.all().prefetch_related('subscriber')
-        if self.request.user.is_anonymous:
-            return queryset
-        return queryset.annotate(
-            is_subscribed=Case(
-                When(
-                    Exists(
-                        self.request.user.subscriber.filter(
-                            author=OuterRef('pk')
-                        )
-                    ),
-                    then=Value(True),
-                ),
-                default=Value(False),
-                output_field=BooleanField(),
-            )
-        )
-
+    queryset = User.objects.all()
     permission_classes = (AllowAny,)
-    pagination_class = LimitOffsetPagination
+    pagination_class = PaginationForUser
 
     def get_serializer_class(self):
+        if use_fast_read(self):
+            return FastUserReadSerializer
         if self.request.method in permissions.SAFE_METHODS:
             return UserReadSerializer
         return UserCreateSerializer
@@ -109,13 +110,13 @@ class UserViewSet(
     def subscriptions(self, request):
         queryset = User.objects.filter(
             subscribing__user=request.user
-        ).annotate(is_subscribed=Value("True"), recipes_count=Count("recipes"))
-        subquery = Recipe.objects.all()
-        queryset = queryset.prefetch_related(
-            Prefetch("recipes", queryset=subquery, to_attr="limited_recipes")
-        )
+        ).annotate(is_subscribed=Value("True"))
         page = self.paginate_queryset(queryset)
-        serializer = SubscriptionsSerializer(
+        attach_limited_recipes(page, request)
+        serializer_class = SubscriptionsSerializer
+        if use_fast_read(self):
+            serializer_class = FastSubscriptionsSerializer
+        serializer = serializer_class(
             page, many=True, context={"request": request}
         )
         return self.get_paginated_response(serializer.data)
@@ -130,6 +131,7 @@ class UserViewSet(
         if request.method == "POST":
             queryset = User.objects.annotate(is_subscribed=Value(True))
             author = get_object_or_404(queryset, id=kwargs["pk"])
+            attach_limited_recipes([author], request)
             serializer = SubscribeAuthorSerializer(
                 author, data=request.data, context={"request": request}
             )
@@ -149,16 +151,25 @@ class UserViewSet(
 
 
 class TagViewSet(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    MetricsViewMixin,
+    CatalogueSnapshotMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
+    snapshot_name = "tags"
 
 
 class IngredientViewSet(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    MetricsViewMixin,
+    CatalogueSnapshotMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     queryset = Ingredient.objects.all()
     permission_classes = (AllowAny,)
@@ -166,68 +177,32 @@ class IngredientViewSet(
     pagination_class = None
     filter_backends = (filters.SearchFilter,)
     search_fields = ("^name",)
+    snapshot_name = "ingredients"
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name", "").strip()
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(
+            ingredient_index.search(name, settings.INGREDIENT_SEARCH_LIMIT)
+        )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    MetricsViewMixin, AnonymousResponseCacheMixin, viewsets.ModelViewSet
+):
     permission_classes = (AuthorOrReadOnlyPermission,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     http_method_names = ["get", "post", "patch", "create", "delete"]
-    pagination_class = PaginationForRecipe
+    pagination_class = CachedCountPaginationForRecipe
 
     def get_queryset(self):
-        if self.request.user.is_anonymous:
-            return Recipe.objects.all()
-        queryset = Recipe.objects.annotate(
-            is_favorited=Case(
-                When(
-                    Exists(
-                        self.request.user.favorite_user.filter(
-                            recipe=OuterRef('pk')
-                        )
-                    ),
-                    then=Value(True),
-                ),
-                default=Value(False),
-                output_field=BooleanField(),
-            )
-        ).annotate(
-            is_in_shopping_cart=Case(
-                When(
-                    Exists(
-                        self.request.user.shopping_user.filter(
-                            recipe=OuterRef('pk')
-                        )
-                    ),
-                    then=Value(True),
-                ),
-                default=Value(False),
-                output_field=BooleanField(),
-            )
-        )
-
-        subquery = User.objects.annotate(
-            is_subscribed=Case(
-                When(
-                    Exists(
-                        self.request.user.subscriber.filter(
-                            author=OuterRef('pk')
-                        )
-                    ),
-                    then=Value(True),
-                ),
-                default=Value(False),
-                output_field=BooleanField(),
-            )
-        )
-        return queryset.prefetch_related(
-            Prefetch(
-                "author",
-                queryset=subquery,
-            )
-        )
+        return Recipe.objects.with_related()
 
     def get_serializer_class(self):
+        if use_fast_read(self):
+            return FastRecipeReadSerializer
         if self.request.method in permissions.SAFE_METHODS:
             return RecipeReadSerializer
         return RecipeCreateSerializer
@@ -298,31 +273,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
 
     @action(
-        detail=False, methods=["get"], permission_classes=(IsAuthenticated,)
+        detail=False,
+        methods=["get"],
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=IgnoreFormatContentNegotiation,
     )
     def download_shopping_cart(self, request, **kwargs):
-        ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__shopping_recipe__user=request.user
-            )
-            .values("ingredient")
-            .annotate(total_amount=Sum("amount"))
-            .values_list(
-                "ingredient__name",
-                "total_amount",
-                "ingredient__measurement_unit",
+        export_format = request.query_params.get("format", "txt")
+        if export_format not in shopping_list.FORMATS:
+            return Response(
+                {
+                    "errors": "Доступные форматы: "
+                    + ", ".join(shopping_list.FORMATS)
+                },
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        etag = shopping_list.cart_etag(request.user, export_format)
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+        export, content_type = shopping_list.FORMATS[export_format]
+        response = StreamingHttpResponse(
+            export(shopping_list.ingredients(request.user)),
+            content_type=content_type,
         )
-        response_contents = []
-        [
-            response_contents.append("{} - {} {}.".format(*ingredient))
-            for ingredient in ingredients
-        ]
-        response = HttpResponse(
-            "Cписок покупок:\n" + "\n".join(response_contents),
-            content_type="text/plain",
-        )
+        response["ETag"] = etag
         response[
             "Content-Disposition"
-        ] = "attachment; filename=shopping_cart.txt"
+        ] = f"attachment; filename=shopping_cart.{export_format}"
         return response
@@ -48,9 +48,11 @@ INSTALLED_APPS = [
     "api",
     "users",
     "recipes",
+    "tasks",
 ]
 
 MIDDLEWARE = [
+    "api.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -140,6 +142,32 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Каталог с ingredients.csv и ingredients.json для load_ingredients. В
+# контейнер бэкенда он подключается томом (infra/docker-compose.yml).
+DATA_DIR = os.getenv("DATA_DIR", default=os.path.join(BASE_DIR.parent, "data"))
+
+# Снимки полных списков тегов и ингредиентов (api/snapshots.py). Лежат в
+# media, чтобы nginx мог отдавать их без бэкенда.
+SNAPSHOT_ROOT = os.path.join(MEDIA_ROOT, "snapshots")
+SNAPSHOT_URL = f"{MEDIA_URL}snapshots/"
+
+# Ограничения на загружаемые изображения рецептов.
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", default=5 * 1024 * 1024))
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", default=4096))
+# Сколько секунд после записи файл изображения не удаляется при замене или
+# удалении рецепта.
+IMAGE_RELEASE_MIN_AGE = int(os.getenv("IMAGE_RELEASE_MIN_AGE", default=3600))
+
+# Очередь фоновых задач: immediate - сразу в текущем потоке, thread - в пуле
+# из TASK_WORKERS потоков процесса, database - в таблице задач, которую
+# разбирает команда run_worker. Можно указать путь к своему классу.
+TASK_BACKEND = os.getenv("TASK_BACKEND", default="thread")
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", default=2))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", default=3))
+# Пауза перед повторной попыткой, удваивается с каждой попыткой.
+TASK_RETRY_DELAY = int(os.getenv("TASK_RETRY_DELAY", default=10))
+TASK_LOCK_TIMEOUT = int(os.getenv("TASK_LOCK_TIMEOUT", default=600))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -158,6 +186,13 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
+    # JSON через orjson, если он установлен, иначе стандартный json.
+    "DEFAULT_RENDERER_CLASSES": [
+        os.getenv(
+            "API_JSON_RENDERER", default="api.renderers.FastJSONRenderer"
+        ),
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 6,
 }
@@ -165,3 +200,73 @@ REST_FRAMEWORK = {
 DJOSER = {
     "LOGIN_FIELD": "email",
 }
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", default="foodgram"),
+    }
+}
+
+# Время хранения ответов /api/recipes/ для анонимных пользователей.
+RECIPE_CACHE_TIMEOUT = int(os.getenv("RECIPE_CACHE_TIMEOUT", default=300))
+
+# Максимальное время жизни индексов ингредиентов и тегов в памяти процесса
+# и количество подсказок, которое отдаёт /api/ingredients/?name=.
+MEMORY_INDEX_MAX_AGE = int(os.getenv("MEMORY_INDEX_MAX_AGE", default=600))
+INGREDIENT_SEARCH_LIMIT = int(os.getenv("INGREDIENT_SEARCH_LIMIT", default=50))
+# Сколько самых релевантных рецептов отдаёт поиск ?search= без PostgreSQL.
+RECIPE_SEARCH_LIMIT = int(os.getenv("RECIPE_SEARCH_LIMIT", default=1000))
+# Сколько id рецептов фильтр ?tags= передаёт в запрос списком, при большем
+# числе рецепты отбираются подзапросом по тегам.
+TAG_FILTER_MAX_IDS = int(os.getenv("TAG_FILTER_MAX_IDS", default=1000))
+
+# TTF-шрифт с кириллицей для выгрузки списка покупок в PDF (reportlab).
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT",
+    default="/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
+# Время хранения общего количества объектов для пагинации. При пороге
+# больше нуля в PostgreSQL выборки, которые по оценке планировщика больше
+# порога, не пересчитываются точно.
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv("PAGINATION_COUNT_CACHE_TIMEOUT", default=30)
+)
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv("PAGINATION_COUNT_ESTIMATE_THRESHOLD", default=0)
+)
+
+# Сколько строк может последовательно просканировать запрос API, прежде чем
+# команда check_query_plans сочтёт это ошибкой.
+QUERY_PLAN_MAX_SEQ_SCAN_ROWS = int(
+    os.getenv("QUERY_PLAN_MAX_SEQ_SCAN_ROWS", default=1000)
+)
+
+# Заголовок Server-Timing с числом и временем SQL-запросов в ответах.
+API_SERVER_TIMING = os.getenv("API_SERVER_TIMING", default="True") == "True"
+# Сколько SQL-запросов может выполнить один запрос к API на чтение и на
+# запись (0 - без ограничения). Запись рецепта с тегами, ингредиентами и
+# обновлением поиска занимает около 22 запросов. Превышение пишется в лог,
+# а при API_QUERY_BUDGET_RAISE вызывает ошибку - так удобно ловить N+1 в
+# тестах.
+API_QUERY_BUDGET = int(os.getenv("API_QUERY_BUDGET", default=20))
+API_WRITE_QUERY_BUDGET = int(os.getenv("API_WRITE_QUERY_BUDGET", default=40))
+API_QUERY_BUDGET_RAISE = (
+    os.getenv("API_QUERY_BUDGET_RAISE", default="False") == "True"
+)
+
+# Отвечать на GET к рецептам и пользователям быстрыми сериализаторами из
+# api/fast_serializers.py вместо сериализаторов DRF.
+API_FAST_READ_SERIALIZERS = (
+    os.getenv("API_FAST_READ_SERIALIZERS", default="True") == "True"
+)
+
+# Время хранения избранного, корзины и подписок пользователя в кеше.
+# Включайте только с общим для всех процессов бэкендом кеша.
+VIEWER_STATE_CACHE_TIMEOUT = int(
+    os.getenv("VIEWER_STATE_CACHE_TIMEOUT", default=0)
+)
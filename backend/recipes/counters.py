@@ -0,0 +1,35 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def related_count(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на текущую запись."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def recount(recipe, user, favorite, shopping_cart, subscribe):
+    """Пересчитывает все денормализованные счётчики."""
+    recipe.objects.update(
+        favorites_count=related_count(favorite, "recipe"),
+        in_carts_count=related_count(shopping_cart, "recipe"),
+    )
+    user.objects.update(
+        recipes_count=related_count(recipe, "author"),
+        subscribers_count=related_count(subscribe, "author"),
+    )
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно меняет счётчик, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    queryset.update(**{field: F(field) + delta})
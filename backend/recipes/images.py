@@ -0,0 +1,116 @@
+import io
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+from tasks.queue import task
+
+VARIANTS_DIR = "recipes/variants"
+# Размер -> наибольшая сторона в пикселях.
+SIZES = {
+    "list": 480,
+    "detail": 1200,
+}
+# Формат -> (формат Pillow, расширение, параметры сохранения).
+FORMATS = {
+    "jpeg": ("JPEG", "jpg", {"quality": 85, "optimize": True}),
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+}
+
+
+def variant_name(source, size, extension):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f"{VARIANTS_DIR}/{stem}-{size}.{extension}"
+
+
+def save_image(image, name, image_format, options):
+    if default_storage.exists(name):
+        return name
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build_variants(source):
+    """Создаёт уменьшенные копии изображения во всех форматах.
+
+    Исходный файл декодируется один раз, копии строятся от большей к
+    меньшей. Возвращает словарь с именем исходного файла и копиями
+    {размер: {формат: имя файла}}.
+    """
+    with default_storage.open(source, "rb") as file:
+        image = Image.open(file)
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    sizes = {}
+    for size, side in sorted(
+        SIZES.items(), key=lambda item: item[1], reverse=True
+    ):
+        image = image.copy()
+        image.thumbnail((side, side), Image.LANCZOS)
+        flat = image.convert("RGB") if image.mode == "RGBA" else image
+        sizes[size] = {
+            key: save_image(
+                image if image_format == "WEBP" else flat,
+                variant_name(source, size, extension),
+                image_format,
+                options,
+            )
+            for key, (image_format, extension, options) in FORMATS.items()
+        }
+    return {"source": source, "sizes": sizes}
+
+
+@task
+def process_recipe_image(recipe_id, source):
+    from .models import Recipe
+
+    variants = build_variants(source)
+    recipe = Recipe.objects.filter(pk=recipe_id, image=source).first()
+    if recipe is not None:
+        recipe.image_variants = variants
+        recipe.save(update_fields=["image_variants"])
+
+
+def variant_names(source):
+    return [
+        variant_name(source, size, extension)
+        for size in SIZES
+        for _, extension, _ in FORMATS.values()
+    ]
+
+
+def modified_before(name, border):
+    """Файл существует и не менялся после border."""
+    try:
+        return default_storage.get_modified_time(name) <= border
+    except FileNotFoundError:
+        return False
+
+
+@task
+def release_recipe_image(source):
+    """Удаляет изображение и его копии, если на него не ссылаются рецепты.
+
+    Файлы моложе IMAGE_RELEASE_MIN_AGE не трогаются: под тем же именем
+    может быть уже сохранено изображение рецепта, который ещё не записан
+    в базу. Такие файлы позже удалит collect_media.
+    """
+    from .models import Recipe
+
+    if not source or Recipe.objects.filter(image=source).exists():
+        return
+    border = timezone.now() - timedelta(seconds=settings.IMAGE_RELEASE_MIN_AGE)
+    for name in [source, *variant_names(source)]:
+        if modified_before(name, border):
+            default_storage.delete(name)
+
+
+def schedule_recipe_image(recipe):
+    """Ставит обработку изображения рецепта в очередь фоновых задач."""
+    process_recipe_image.delay(recipe.pk, recipe.image.name)
@@ -0,0 +1,55 @@
+from bisect import bisect_left
+
+from .memory_index import MemoryIndex
+from .models import Ingredient
+
+
+class IngredientIndex(MemoryIndex):
+    """Отсортированный индекс ингредиентов для поиска по началу названия."""
+
+    version_key = "ingredient_index:version"
+
+    def __init__(self):
+        super().__init__()
+        self.snapshot = ([], [])
+
+    def build(self):
+        rows = sorted(
+            (name.casefold(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                "pk", "name", "measurement_unit"
+            )
+        )
+        self.snapshot = (
+            [row[0] for row in rows],
+            [
+                {"id": pk, "name": name, "measurement_unit": measurement_unit}
+                for _, pk, name, measurement_unit in rows
+            ],
+        )
+
+    def search(self, query, limit):
+        """Сначала совпадения с началом названия, затем вхождения."""
+        self.ensure_fresh()
+        keys, items = self.snapshot
+        query = query.strip().casefold()
+        if not query:
+            return items[:limit]
+        position = bisect_left(keys, query)
+        results = []
+        while (
+            position < len(keys)
+            and keys[position].startswith(query)
+            and len(results) < limit
+        ):
+            results.append(items[position])
+            position += 1
+        for key, item in zip(keys, items):
+            if len(results) >= limit:
+                break
+            if query in key and not key.startswith(query):
+                results.append(item)
+        return results
+
+
+index = IngredientIndex()
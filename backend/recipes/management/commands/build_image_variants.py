@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит уменьшенные копии изображений рецептов, у которых их ещё "
+        "нет или они построены для другого файла."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Перестроить копии для всех рецептов.",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        recipes = Recipe.objects.exclude(image="").values_list(
+            "pk", "image", "image_variants"
+        )
+        for pk, image, variants in recipes.iterator():
+            if options["all"] or variants.get("source") != image:
+                process_recipe_image(pk, image)
+                processed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Обработано изображений: {processed}.")
+        )
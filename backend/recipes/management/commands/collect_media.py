@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from recipes.images import VARIANTS_DIR, modified_before, variant_names
+from recipes.models import Recipe
+
+IMAGES_DIR = "recipes"
+
+
+def referenced_files():
+    """Имена изображений рецептов и их уменьшенных копий."""
+    names = set()
+    for image in (
+        Recipe.objects.exclude(image="")
+        .values_list("image", flat=True)
+        .iterator()
+    ):
+        names.add(image)
+        names.update(variant_names(image))
+    return names
+
+
+def stored_files():
+    for directory in (IMAGES_DIR, VARIANTS_DIR):
+        if not default_storage.exists(directory):
+            continue
+        for filename in default_storage.listdir(directory)[1]:
+            yield f"{directory}/{filename}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из MEDIA_ROOT изображения рецептов и их копии, на которые "
+        "не ссылается ни один рецепт."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=24,
+            help=(
+                "Не трогать файлы моложе стольких часов: они могут "
+                "принадлежать ещё не сохранённому рецепту."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать файлы, которые будут удалены.",
+        )
+
+    def handle(self, *args, **options):
+        referenced = referenced_files()
+        border = timezone.now() - timedelta(hours=options["min_age"])
+        removed = 0
+        for name in stored_files():
+            if name in referenced:
+                continue
+            if not modified_before(name, border):
+                continue
+            self.stdout.write(name)
+            if not options["dry_run"]:
+                default_storage.delete(name)
+            removed += 1
+        action = "Найдено" if options["dry_run"] else "Удалено"
+        self.stdout.write(
+            self.style.SUCCESS(f"{action} неиспользуемых файлов: {removed}.")
+        )
@@ -0,0 +1,170 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.ingredient_index import index as ingredient_index
+from recipes.models import Ingredient
+
+DEFAULT_PATH = Path(settings.DATA_DIR) / "ingredients.csv"
+READ_SIZE = 64 * 1024
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8", newline="") as file:
+        for row in csv.reader(file):
+            if len(row) != 2:
+                continue
+            yield row[0], row[1]
+
+
+def skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in " \t\r\n,":
+        position += 1
+    return position
+
+
+def read_json(path):
+    """Потоково разбирает JSON-массив объектов, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as file:
+        buffer = file.read(READ_SIZE).lstrip()
+        if not buffer.startswith("["):
+            raise CommandError("Ожидается JSON-массив.")
+        buffer = buffer[1:]
+        while True:
+            chunk = file.read(READ_SIZE)
+            buffer += chunk
+            position = skip_separators(buffer, 0)
+            while position < len(buffer) and buffer[position] != "]":
+                try:
+                    item, position = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    break
+                yield item["name"], item["measurement_unit"]
+                position = skip_separators(buffer, position)
+            buffer = buffer[position:]
+            if buffer.startswith("]"):
+                return
+            if not chunk:
+                raise CommandError("Некорректный JSON-файл.")
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = "Загружает ингредиенты из CSV или JSON файла в базу данных."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=str(DEFAULT_PATH),
+            help=(
+                "Путь до файла ingredients.csv или ingredients.json, "
+                "по умолчанию DATA_DIR/ingredients.csv."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество строк в одной пачке вставки.",
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Не использовать COPY даже для PostgreSQL.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"Файл {path} не найден.")
+        if path.suffix == ".json":
+            rows = read_json(path)
+        elif path.suffix == ".csv":
+            rows = read_csv(path)
+        else:
+            raise CommandError("Поддерживаются только файлы .csv и .json.")
+        rows = (
+            (name.strip(), unit.strip())
+            for name, unit in rows
+            if name.strip() and unit.strip()
+        )
+        started = time.monotonic()
+        with transaction.atomic():
+            if connection.vendor == "postgresql" and not options["no_copy"]:
+                read, created = self.load_with_copy(
+                    rows, options["batch_size"]
+                )
+            else:
+                read, created = self.load_with_bulk_create(
+                    rows, options["batch_size"]
+                )
+        if created:
+            ingredient_index.invalidate()
+            call_command("build_snapshots", "ingredients")
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Прочитано строк: {read}, добавлено ингредиентов: "
+                f"{created} за {elapsed:.2f} с "
+                f"({read / elapsed:.0f} строк/с)."
+            )
+        )
+
+    def load_with_bulk_create(self, rows, batch_size):
+        """Повторы пропускает уникальный индекс, память не растёт с файлом."""
+        before = Ingredient.objects.count()
+        read = 0
+        for chunk in chunked(rows, batch_size):
+            read += len(chunk)
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in chunk
+                ),
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+        return read, Ingredient.objects.count() - before
+
+    def load_with_copy(self, rows, batch_size):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        read = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE ingredient_import "
+                "(name varchar(200), measurement_unit text) ON COMMIT DROP"
+            )
+            for chunk in chunked(rows, batch_size):
+                read += len(chunk)
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(chunk)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    "COPY ingredient_import FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+            cursor.execute(
+                f"INSERT INTO {table} (name, measurement_unit) "
+                "SELECT DISTINCT name, measurement_unit "
+                "FROM ingredient_import "
+                "ON CONFLICT (name, measurement_unit) DO NOTHING"
+            )
+            created = cursor.rowcount
+        return read, created
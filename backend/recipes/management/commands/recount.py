@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recipes.counters import recount
+from recipes.models import Favorite, Recipe, Shopping_cart
+from users.models import Subscribe, User
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики избранного, корзин, рецептов и подписчиков."
+
+    def handle(self, *args, **options):
+        recount(Recipe, User, Favorite, Shopping_cart, Subscribe)
+        self.stdout.write(self.style.SUCCESS("Счётчики пересчитаны."))
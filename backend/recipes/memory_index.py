@@ -0,0 +1,55 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class MemoryIndex:
+    """Базовый класс индексов, которые хранятся в памяти процесса.
+
+    Индекс строится при первом обращении. После изменения данных сигналы
+    повышают версию в кеше, и каждый процесс перестраивает свой индекс,
+    увидев новую версию. Дополнительно индекс перестраивается не реже, чем
+    раз в MEMORY_INDEX_MAX_AGE секунд.
+    """
+
+    version_key = None
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.built_at = 0
+
+    def build(self):
+        raise NotImplementedError
+
+    def is_fresh(self, version):
+        age = time.monotonic() - self.built_at
+        return self.version == version and age <= settings.MEMORY_INDEX_MAX_AGE
+
+    def ensure_fresh(self):
+        version = cache.get(self.version_key, 0)
+        if self.is_fresh(version):
+            return
+        with self.lock:
+            if not self.is_fresh(version):
+                self.build()
+                self.version = version
+                self.built_at = time.monotonic()
+
+    def bump_version(self):
+        try:
+            return cache.incr(self.version_key)
+        except ValueError:
+            cache.add(self.version_key, 1, None)
+            return cache.get(self.version_key, 1)
+
+    def invalidate(self):
+        """Повышает версию после фиксации транзакции.
+
+        Иначе другие процессы могут перестроить индекс по старым данным и
+        запомнить его с новой версией, а при откате версия меняется зря.
+        """
+        transaction.on_commit(self.bump_version)
@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def related_count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    User = apps.get_model("users", "User")
+    Favorite = apps.get_model("recipes", "Favorite")
+    Shopping_cart = apps.get_model("recipes", "Shopping_cart")
+    Subscribe = apps.get_model("users", "Subscribe")
+    Recipe.objects.update(
+        favorites_count=related_count(Favorite, "recipe"),
+        in_carts_count=related_count(Shopping_cart, "recipe"),
+    )
+    User.objects.update(
+        recipes_count=related_count(Recipe, "author"),
+        subscribers_count=related_count(Subscribe, "author"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0004_counters"),
+        ("users", "0005_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
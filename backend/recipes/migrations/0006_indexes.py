@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-18 19:43
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    duplicates = (
+        RecipeIngredient.objects.values("recipe", "ingredient")
+        .annotate(rows=Count("pk"), total=Sum("amount"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates:
+        rows = RecipeIngredient.objects.filter(
+            recipe=duplicate["recipe"], ingredient=duplicate["ingredient"]
+        ).order_by("pk")
+        first = rows.first()
+        rows.exclude(pk=first.pk).delete()
+        first.amount = duplicate["total"]
+        first.save(update_fields=["amount"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0005_fill_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                fields=['name'],
+                name='ingredient_name_prefix_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['author', '-id'], name='recipe_author_id_idx'
+            ),
+        ),
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipe_ingredient',
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEX_NAME = "recipe_search_vector_idx"
+CONFIG = "russian"
+
+
+def create_search_index(apps, schema_editor):
+    search = django.contrib.postgres.search
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+        "ON recipes_recipe USING gin (search_vector)"
+    )
+    apps.get_model("recipes", "Recipe").objects.update(
+        search_vector=(
+            search.SearchVector("name", weight="A", config=CONFIG)
+            + search.SearchVector("text", weight="B", config=CONFIG)
+        )
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0006_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
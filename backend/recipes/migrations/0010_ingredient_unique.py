@@ -0,0 +1,51 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Оставляет один ингредиент на пару название - единица измерения.
+
+    Строки рецептов переносятся на оставшийся ингредиент, а если он уже
+    есть в рецепте, количества складываются.
+    """
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    duplicates = (
+        Ingredient.objects.order_by()
+        .values("name", "measurement_unit")
+        .annotate(keep=Min("pk"), total=Count("pk"))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        extra = Ingredient.objects.filter(
+            name=group["name"], measurement_unit=group["measurement_unit"]
+        ).exclude(pk=group["keep"])
+        for row in RecipeIngredient.objects.filter(ingredient__in=extra):
+            kept = RecipeIngredient.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=group["keep"]
+            ).first()
+            if kept is None:
+                row.ingredient_id = group["keep"]
+                row.save(update_fields=["ingredient"])
+            else:
+                kept.amount += row.amount
+                kept.save(update_fields=["amount"])
+                row.delete()
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0009_recipe_image_storage"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="unique_ingredient_name_unit",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+# istartswith в PostgreSQL сравнивает UPPER("name"::text) LIKE UPPER(%s),
+# поэтому индекс по самому name для поиска по началу названия не подходит.
+CREATE_INDEX = (
+    "CREATE INDEX ingredient_name_upper_prefix_idx "
+    "ON recipes_ingredient (UPPER(name::text) text_pattern_ops)"
+)
+DROP_INDEX = "DROP INDEX IF EXISTS ingredient_name_upper_prefix_idx"
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_INDEX)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0010_ingredient_unique"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="ingredient",
+            name="ingredient_name_prefix_idx",
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
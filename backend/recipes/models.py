@@ -1,9 +1,27 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.db.models.functions import Cast
+from django.dispatch import Signal
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
+# Отправляется после удаления одной записи методом delete(). Обработчики
+# post_delete запрещают Django удалять связанные строки одним запросом,
+# поэтому каскадное удаление рецепта или пользователя этот сигнал не
+# отправляет, а счётчики и кеши обновляются обработчиками Recipe и User.
+row_deleted = Signal()
+
+
+class RowDeletedSignalMixin:
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        row_deleted.send(sender=type(self), instance=self)
+        return result
+
 
 class Tag(models.Model):
     name = models.TextField(
@@ -29,6 +47,82 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ["-id"]
+        # Индекс UPPER(name) для поиска ?search= по началу названия создаётся
+        # миграцией 0011 только в PostgreSQL.
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="unique_ingredient_name_unit",
+            ),
+        ]
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        """Подгружает связанные объекты, нужные RecipeReadSerializer."""
+        return self.select_related("author").prefetch_related(
+            "tags",
+            models.Prefetch(
+                "recipes",
+                queryset=RecipeIngredient.objects.select_related("ingredient"),
+            ),
+        )
+
+    def latest_by_author(self, author_ids, limit=None):
+        """Последние limit рецептов каждого автора одним запросом.
+
+        Возвращает словарь {author_id: [рецепты]}, рецепты отбираются
+        оконной функцией ROW_NUMBER() на стороне базы данных.
+        """
+        result = {author_id: [] for author_id in author_ids}
+        if not result:
+            return result
+        table = self.model._meta.db_table
+        placeholders = ", ".join(["%s"] * len(result))
+        params = list(result)
+        condition = ""
+        if limit is not None:
+            condition = "WHERE ranked.position <= %s"
+            params.append(limit)
+        recipes = self.raw(
+            f"SELECT * FROM (SELECT recipe.*, ROW_NUMBER() OVER ("
+            f"PARTITION BY recipe.author_id ORDER BY recipe.id DESC"
+            f") AS position FROM {table} recipe "
+            f"WHERE recipe.author_id IN ({placeholders})) ranked "
+            f"{condition} ORDER BY ranked.author_id, ranked.id DESC",
+            params,
+        )
+        for recipe in recipes:
+            result[recipe.author_id].append(recipe)
+        return result
+
+    def ranked_by_ingredients(self, ingredient_ids):
+        """Рецепты с указанными ингредиентами по убыванию покрытия.
+
+        Покрытие - доля строк RecipeIngredient рецепта, ингредиенты которых
+        есть в ingredient_ids. Кандидаты отбираются по индексу на
+        RecipeIngredient.ingredient, покрытие считается одним запросом с
+        группировкой.
+        """
+        candidates = RecipeIngredient.objects.filter(
+            ingredient_id__in=ingredient_ids
+        ).values("recipe_id")
+        matched = models.Count(
+            "recipes",
+            filter=models.Q(recipes__ingredient_id__in=ingredient_ids),
+        )
+        return (
+            self.filter(pk__in=candidates)
+            .annotate(
+                matched_ingredients=matched,
+                coverage=models.ExpressionWrapper(
+                    Cast(matched, models.FloatField())
+                    / models.Count("recipes"),
+                    output_field=models.FloatField(),
+                ),
+            )
+            .order_by("-coverage", "-matched_ingredients", "-id")
+        )
 
 
 class Recipe(models.Model):
@@ -42,6 +136,8 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name="Изображение",
         upload_to="recipes/",
+        storage=ContentAddressedStorage(),
+        db_index=True,
     )
     text = models.CharField(verbose_name="Описание", max_length=5000)
     ingredients = models.ManyToManyField(
@@ -57,12 +153,31 @@ class Recipe(models.Model):
     cooking_time = models.IntegerField(
         verbose_name="Время приготовления", validators=[MinValueValidator(1)]
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном", default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name="В списках покупок", default=0, editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    image_variants = models.JSONField(
+        verbose_name="Уменьшенные копии изображения",
+        default=dict,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ["-id"]
+        indexes = [
+            models.Index(
+                fields=["author", "-id"], name="recipe_author_id_idx"
+            ),
+        ]
 
 
-class RecipeIngredient(models.Model):
+class RecipeIngredient(RowDeletedSignalMixin, models.Model):
     recipe = models.ForeignKey(
         Recipe,
         verbose_name="Рецепт",
@@ -81,9 +196,15 @@ class RecipeIngredient(models.Model):
 
     class Meta:
         ordering = ["-id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "ingredient"],
+                name="unique_recipe_ingredient",
+            ),
+        ]
 
 
-class Favorite(models.Model):
+class Favorite(RowDeletedSignalMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -103,7 +224,7 @@ class Favorite(models.Model):
         ordering = ["-id"]
 
 
-class Shopping_cart(models.Model):
+class Shopping_cart(RowDeletedSignalMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -0,0 +1,128 @@
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres import search as postgres
+from django.db import connections
+from django.db.models import Case, F, IntegerField, When
+
+from .memory_index import MemoryIndex
+from .models import Recipe
+
+CONFIG = "russian"
+# Поля рецепта, из которых строятся search_vector и индекс в памяти.
+SEARCH_FIELDS = {"name", "text"}
+WORD = re.compile(r"\w+")
+CHUNK_SIZE = 2000
+# Во сколько раз слово в названии весит больше слова в описании.
+NAME_WEIGHT = 2
+
+
+def tokenize(text):
+    return WORD.findall(text.casefold())
+
+
+def uses_postgresql(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def search_vector():
+    return postgres.SearchVector(
+        "name", weight="A", config=CONFIG
+    ) + postgres.SearchVector("text", weight="B", config=CONFIG)
+
+
+def update_search_vector(queryset):
+    """Пересчитывает колонку search_vector. Нужна только в PostgreSQL."""
+    if uses_postgresql(queryset):
+        queryset.update(search_vector=search_vector())
+
+
+class RecipeSearchIndex(MemoryIndex):
+    """Обратный индекс слов названий и описаний рецептов.
+
+    Используется вместо полнотекстового поиска PostgreSQL на других базах
+    данных. Слово запроса совпадает со всеми словами, которые с него
+    начинаются, рецепт должен содержать все слова запроса. Релевантность
+    считается по TF-IDF, слова из названия весят больше.
+    """
+
+    version_key = "recipe_search_index:version"
+
+    def __init__(self):
+        super().__init__()
+        self.snapshot = ([], {}, 0)
+
+    def build(self):
+        postings = defaultdict(dict)
+        count = 0
+        rows = Recipe.objects.values_list("pk", "name", "text").iterator(
+            chunk_size=CHUNK_SIZE
+        )
+        for pk, name, text in rows:
+            count += 1
+            for weight, field in ((NAME_WEIGHT, name), (1, text)):
+                for term in tokenize(field):
+                    documents = postings[term]
+                    documents[pk] = documents.get(pk, 0) + weight
+        self.snapshot = (sorted(postings), dict(postings), count)
+
+    def score_word(self, word):
+        terms, postings, count = self.snapshot
+        scores = defaultdict(float)
+        position = bisect_left(terms, word)
+        while position < len(terms) and terms[position].startswith(word):
+            documents = postings[terms[position]]
+            idf = math.log(1 + count / len(documents))
+            for pk, frequency in documents.items():
+                scores[pk] += frequency * idf
+            position += 1
+        return scores
+
+    def search(self, query, limit):
+        """Id рецептов по убыванию релевантности, не больше limit."""
+        self.ensure_fresh()
+        scores = None
+        for word in set(tokenize(query)):
+            word_scores = self.score_word(word)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {
+                    pk: score + word_scores[pk]
+                    for pk, score in scores.items()
+                    if pk in word_scores
+                }
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return heapq.nlargest(limit, scores, key=lambda pk: (scores[pk], pk))
+
+
+index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, по убыванию релевантности."""
+    if uses_postgresql(queryset):
+        query = postgres.SearchQuery(
+            query, config=CONFIG, search_type="websearch"
+        )
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(rank=postgres.SearchRank(F("search_vector"), query))
+            .order_by("-rank", "-id")
+        )
+    ids = index.search(query, settings.RECIPE_SEARCH_LIMIT)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(
+        Case(
+            *(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+            output_field=IntegerField(),
+        )
+    )
@@ -0,0 +1,114 @@
+from django.db.models import signals
+from django.dispatch import receiver
+
+from .counters import change_counter, related_count
+from .images import release_recipe_image, schedule_recipe_image
+from .models import Favorite, Recipe, Shopping_cart, User, row_deleted
+from .search import SEARCH_FIELDS, update_search_vector
+
+
+@receiver(signals.post_save, sender=Favorite)
+def favorite_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id), "favorites_count", 1
+        )
+
+
+@receiver(row_deleted, sender=Favorite)
+def favorite_removed(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), "favorites_count", -1
+    )
+
+
+@receiver(signals.post_save, sender=Shopping_cart)
+def shopping_cart_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id), "in_carts_count", 1
+        )
+
+
+@receiver(row_deleted, sender=Shopping_cart)
+def shopping_cart_removed(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), "in_carts_count", -1
+    )
+
+
+@receiver(signals.pre_delete, sender=User)
+def user_removing(sender, instance, **kwargs):
+    """Запоминает рецепты, из избранного и корзин которых уйдёт user."""
+    instance.affected_recipe_ids = list(
+        Favorite.objects.filter(user=instance)
+        .order_by()
+        .values_list("recipe_id", flat=True)
+        .union(
+            Shopping_cart.objects.filter(user=instance)
+            .order_by()
+            .values_list("recipe_id", flat=True)
+        )
+    )
+
+
+@receiver(signals.post_delete, sender=User)
+def user_removed(sender, instance, **kwargs):
+    """Пересчитывает счётчики рецептов одним запросом после каскада."""
+    recipe_ids = getattr(instance, "affected_recipe_ids", None)
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            favorites_count=related_count(Favorite, "recipe"),
+            in_carts_count=related_count(Shopping_cart, "recipe"),
+        )
+
+
+@receiver(signals.post_save, sender=Recipe)
+def recipe_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), "recipes_count", 1
+        )
+
+
+@receiver(signals.post_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), "recipes_count", -1
+    )
+
+
+@receiver(signals.post_save, sender=Recipe)
+def recipe_text_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        update_search_vector(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(signals.post_save, sender=Recipe)
+def recipe_image_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and "image" not in update_fields:
+        return
+    if instance.image and (
+        instance.image_variants.get("source") != instance.image.name
+    ):
+        schedule_recipe_image(instance)
+
+
+@receiver(signals.pre_save, sender=Recipe)
+def recipe_image_replaced(sender, instance, update_fields, **kwargs):
+    if instance.pk is None or (
+        update_fields is not None and "image" not in update_fields
+    ):
+        return
+    previous = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list("image", flat=True)
+        .first()
+    )
+    if previous and previous != instance.image.name:
+        release_recipe_image.delay(previous)
+
+
+@receiver(signals.post_delete, sender=Recipe)
+def recipe_image_removed(sender, instance, **kwargs):
+    release_recipe_image.delay(instance.image.name)
@@ -0,0 +1,38 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+def content_name(file, extension):
+    """Имя файла по SHA-256 содержимого для неизменяемого кеширования."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return f"{digest.hexdigest()}{extension.lower()}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла - хеш его содержимого.
+
+    Одинаковые файлы записываются на диск один раз, а все рецепты с таким
+    изображением ссылаются на одно имя. Удалением файлов, на которые больше
+    никто не ссылается, занимаются release_recipe_image и команда
+    collect_media.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        directory, basename = os.path.split(name)
+        name = os.path.join(
+            directory, content_name(content, os.path.splitext(basename)[1])
+        )
+        if self.exists(name):
+            return name
+        return self._save(name, content)
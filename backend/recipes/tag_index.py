@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .memory_index import MemoryIndex
+from .models import Recipe, Tag
+
+
+class TagIndex(MemoryIndex):
+    """Множества id рецептов для каждого тега.
+
+    Фильтр по нескольким тегам сводится к объединению множеств без
+    обращения к базе данных. Опубликованные множества не меняются: при
+    изменении создаются новые множества для затронутых тегов. Изменения
+    в текущем процессе применяются сразу после фиксации транзакции,
+    остальные процессы перестраивают индекс по новой версии.
+    """
+
+    version_key = "tag_index:version"
+
+    def __init__(self):
+        super().__init__()
+        self.recipes = {}
+        self.slugs = {}
+
+    def build(self):
+        slugs = dict(Tag.objects.values_list("pk", "slug"))
+        recipes = defaultdict(set)
+        rows = Recipe.tags.through.objects.values_list("tag_id", "recipe_id")
+        for tag_id, recipe_id in rows.iterator():
+            recipes[slugs[tag_id]].add(recipe_id)
+        self.recipes = {slug: recipes[slug] for slug in slugs.values()}
+        self.slugs = slugs
+
+    def choices(self):
+        self.ensure_fresh()
+        return [(slug, slug) for slug in sorted(self.recipes)]
+
+    def recipe_ids(self, slugs, limit=None):
+        """Id рецептов с любым из тегов или None, если их больше limit."""
+        self.ensure_fresh()
+        recipes = self.recipes
+        ids = set().union(*(recipes.get(slug, ()) for slug in slugs))
+        if limit is not None and len(ids) > limit:
+            return None
+        return sorted(ids)
+
+    def apply(self, changes):
+        """Применяет [(tag_id, recipe_id, добавлен)] после коммита."""
+        changes = list(changes)
+        transaction.on_commit(lambda: self.apply_now(changes))
+
+    def apply_now(self, changes):
+        with self.lock:
+            version = self.bump_version()
+            if self.version is None:
+                return
+            complete = True
+            updated = {}
+            for tag_id, recipe_id, added in changes:
+                slug = self.slugs.get(tag_id)
+                if slug is None:
+                    # Тег создан в другом процессе: остальные изменения
+                    # применяются, а индекс перестроится при обращении.
+                    complete = False
+                    continue
+                if slug not in updated:
+                    updated[slug] = set(self.recipes[slug])
+                if added:
+                    updated[slug].add(recipe_id)
+                else:
+                    updated[slug].discard(recipe_id)
+            self.recipes = {**self.recipes, **updated}
+            if complete and version == self.version + 1:
+                self.version = version
+
+    def remove_recipe(self, recipe_id):
+        self.apply((tag_id, recipe_id, False) for tag_id in list(self.slugs))
+
+
+index = TagIndex()
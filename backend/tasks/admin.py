@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from . import models
+
+
+@admin.register(models.Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("pk", "name", "status", "attempts", "run_at", "created")
+    list_filter = ("status", "name")
+    readonly_fields = ("last_error",)
+    empty_value_display = "Пусто"
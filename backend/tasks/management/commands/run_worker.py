@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from tasks.queue import DatabaseBackend
+
+
+class Command(BaseCommand):
+    help = "Выполняет задачи из очереди в базе данных (TASK_BACKEND=database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить накопившиеся задачи и завершиться.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Пауза в секундах, когда очередь пуста.",
+        )
+
+    def handle(self, *args, **options):
+        backend = DatabaseBackend()
+        processed = 0
+        while True:
+            close_old_connections()
+            if backend.run_next():
+                processed += 1
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {processed}."))
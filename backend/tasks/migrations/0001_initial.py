@@ -0,0 +1,98 @@
+# Generated by Django 3.2 on 2026-10-18 19:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'name',
+                    models.CharField(max_length=255, verbose_name='Функция'),
+                ),
+                (
+                    'args',
+                    models.JSONField(
+                        default=list, verbose_name='Позиционные аргументы'
+                    ),
+                ),
+                (
+                    'kwargs',
+                    models.JSONField(
+                        default=dict, verbose_name='Именованные аргументы'
+                    ),
+                ),
+                (
+                    'status',
+                    models.CharField(
+                        choices=[
+                            ('pending', 'Ожидает'),
+                            ('running', 'Выполняется'),
+                            ('failed', 'Ошибка'),
+                        ],
+                        default='pending',
+                        max_length=16,
+                        verbose_name='Статус',
+                    ),
+                ),
+                (
+                    'attempts',
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name='Попыток'
+                    ),
+                ),
+                (
+                    'run_at',
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name='Выполнить после',
+                    ),
+                ),
+                (
+                    'locked_at',
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name='Взята в работу'
+                    ),
+                ),
+                (
+                    'last_error',
+                    models.TextField(
+                        blank=True, verbose_name='Последняя ошибка'
+                    ),
+                ),
+                (
+                    'created',
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name='Создана'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Задача',
+                'verbose_name_plural': 'Задачи',
+                'ordering': ('run_at', 'pk'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(
+                fields=['status', 'run_at'], name='task_status_run_at_idx'
+            ),
+        ),
+    ]
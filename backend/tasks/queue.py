@@ -0,0 +1,164 @@
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache, update_wrapper
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTask:
+    """Функция, которую можно выполнить в фоне через delay().
+
+    Аргументы задачи должны сериализоваться в JSON, чтобы её можно было
+    сохранить в очередь DatabaseBackend.
+    """
+
+    def __init__(self, function):
+        update_wrapper(self, function)
+        self.function = function
+        self.name = f"{function.__module__}.{function.__qualname__}"
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Ставит задачу в очередь после коммита текущей транзакции."""
+        transaction.on_commit(
+            lambda: get_backend().enqueue(self.name, args, kwargs)
+        )
+
+
+def task(function):
+    return BackgroundTask(function)
+
+
+def retry_delay(attempt):
+    return settings.TASK_RETRY_DELAY * 2 ** (attempt - 1)
+
+
+def execute(name, args, kwargs):
+    """Выполняет задачу, возвращает текст ошибки или None."""
+    try:
+        import_string(name)(*args, **kwargs)
+    except Exception:
+        logger.exception("Ошибка в фоновой задаче %s", name)
+        return traceback.format_exc()
+    return None
+
+
+class ImmediateBackend:
+    """Выполняет задачи сразу в текущем потоке, без пауз между попытками."""
+
+    def enqueue(self, name, args, kwargs):
+        for _ in range(settings.TASK_MAX_ATTEMPTS):
+            if execute(name, args, kwargs) is None:
+                return
+
+
+class ThreadBackend:
+    """Выполняет задачи в пуле потоков текущего процесса.
+
+    Задачи не переживают перезапуск процесса. Повторная попытка
+    планируется таймером, чтобы не занимать поток пула на время паузы.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.TASK_WORKERS, thread_name_prefix="tasks"
+        )
+
+    def enqueue(self, name, args, kwargs, attempt=1):
+        self.executor.submit(self.run, name, args, kwargs, attempt)
+
+    def run(self, name, args, kwargs, attempt):
+        try:
+            error = execute(name, args, kwargs)
+        finally:
+            connections.close_all()
+        if error is not None and attempt < settings.TASK_MAX_ATTEMPTS:
+            timer = threading.Timer(
+                retry_delay(attempt),
+                self.enqueue,
+                (name, args, kwargs, attempt + 1),
+            )
+            timer.daemon = True
+            timer.start()
+
+
+class DatabaseBackend:
+    """Хранит задачи в таблице Task, выполняет их команда run_worker.
+
+    Подходит для нескольких процессов и серверов: задачу забирает тот
+    обработчик, чей UPDATE первым сменил её статус. Задачи, зависшие в
+    работе дольше TASK_LOCK_TIMEOUT секунд, выдаются повторно.
+    """
+
+    def enqueue(self, name, args, kwargs):
+        Task.objects.create(name=name, args=list(args), kwargs=kwargs)
+
+    def claim(self):
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.TASK_LOCK_TIMEOUT)
+        candidates = Task.objects.filter(
+            Q(status=Task.PENDING, run_at__lte=now)
+            | Q(status=Task.RUNNING, locked_at__lt=stale)
+        ).values_list("pk", "status", "locked_at")
+        for pk, status, locked_at in candidates[:10]:
+            claimed = Task.objects.filter(
+                pk=pk, status=status, locked_at=locked_at
+            ).update(status=Task.RUNNING, locked_at=now)
+            if claimed:
+                return Task.objects.get(pk=pk)
+        return None
+
+    def run_next(self):
+        """Выполняет одну задачу из очереди. False, если очередь пуста."""
+        queued = self.claim()
+        if queued is None:
+            return False
+        queued.attempts += 1
+        error = execute(queued.name, queued.args, queued.kwargs)
+        if error is None:
+            queued.delete()
+            return True
+        queued.last_error = error
+        queued.locked_at = None
+        if queued.attempts >= settings.TASK_MAX_ATTEMPTS:
+            queued.status = Task.FAILED
+        else:
+            queued.status = Task.PENDING
+            queued.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(queued.attempts)
+            )
+        queued.save()
+        return True
+
+
+BACKENDS = {
+    "immediate": ImmediateBackend,
+    "thread": ThreadBackend,
+    "database": DatabaseBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def load_backend(name):
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        backend_class = import_string(name)
+    return backend_class()
+
+
+def get_backend():
+    """Бэкенд из настройки TASK_BACKEND: имя из BACKENDS или путь к классу."""
+    return load_backend(settings.TASK_BACKEND)
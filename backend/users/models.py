@@ -9,6 +9,12 @@ class User(AbstractUser):
         max_length=254,
     )
     password = models.CharField('Пароль', max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        "Количество рецептов", default=0, editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        "Количество подписчиков", default=0, editable=False
+    )
 
     class Meta:
         ordering = ("pk",)
@@ -34,3 +40,8 @@ class Subscribe(models.Model):
 
     class Meta:
         unique_together = ("user", "author")
+        indexes = [
+            models.Index(
+                fields=["author", "user"], name="subscribe_author_user_idx"
+            ),
+        ]
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.counters import change_counter
+
+from .models import Subscribe, User
+
+
+@receiver(post_save, sender=Subscribe)
+def subscribe_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), "subscribers_count", 1
+        )
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscribe_removed(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), "subscribers_count", -1
+    )